@@ -0,0 +1,324 @@
+"""
+Propose author identity links: candidate groups of author names (and the
+records they occur in) that probably refer to the same person, in the
+format of data/authorSameAs.json.
+
+The curated links (data/authorSameAs.json and data/author2id.json) are
+taken into account: names that curators already put in the same cluster are
+not proposed again, and candidate groups that join names of different
+curated clusters are listed as conflicts.
+
+Usage (from the repository root):
+    python authorlinks.py --blocking surname --scorer components --threshold 0.85
+"""
+
+import json
+import argparse
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from main import splitPersonName, JSONFILE
+from utils import loadJSON, spellingKey
+
+CANDIDATEFILE = "data/authorSameAs_candidates.json"
+CONFLICTFILE = "data/authorSameAs_conflicts.json"
+AUTHOR2ID = "data/author2id.json"
+AUTHORSAMEAS = "data/authorSameAs.json"
+
+
+class AuthorName:
+    """A distinct author name string with its pnv components and records."""
+
+    def __init__(self, name: str):
+
+        self.name = name
+        self.records = []
+
+        components = splitPersonName(name)[0]
+        self.surname = spellingKey(
+            " ".join(
+                i for i in (components["baseSurname"], components["patronym"]) if i
+            )
+        )
+        self.given = spellingKey(
+            components["givenName"] or components["initials"] or ""
+        )
+        self.key = spellingKey(name)
+
+
+## Blocking: name --> block keys. Only names that share a key are compared.
+
+
+def surnameBlocks(author: AuthorName):
+    """Block on the spelling folded surname (with patronym)."""
+
+    return [author.surname] if author.surname else []
+
+
+def ngramBlocks(author: AuthorName, n: int = 3):
+    """Block on the character n-grams of the spelling folded surname."""
+
+    s = f" {author.surname} "
+
+    return {s[i : i + n] for i in range(len(s) - n + 1)}
+
+
+BLOCKING = {
+    "surname": surnameBlocks,
+    "ngram": ngramBlocks,
+}
+
+
+## Scoring: (AuthorName, AuthorName) --> similarity in [0, 1]
+
+
+def nameScore(a: AuthorName, b: AuthorName):
+    """Similarity of the complete spelling folded names."""
+
+    return SequenceMatcher(None, a.key, b.key).ratio()
+
+
+def componentScore(a: AuthorName, b: AuthorName):
+    """
+    Surname similarity, weighed with the given names: the same given name
+    or matching initials count, a conflicting given name rules a pair out.
+    """
+
+    surname = SequenceMatcher(None, a.surname, b.surname).ratio()
+
+    if not a.given or not b.given:
+        given = 0.8
+    elif a.given == b.given:
+        given = 1.0
+    elif a.given.split()[0][0] == b.given.split()[0][0] and (
+        len(a.given) <= 2 or len(b.given) <= 2
+    ):
+        given = 0.9  # initial
+    else:
+        given = SequenceMatcher(None, a.given, b.given).ratio()
+        if given < 0.75:
+            return 0.0
+
+    return 0.7 * surname + 0.3 * given
+
+
+SCORERS = {
+    "name": nameScore,
+    "components": componentScore,
+}
+
+
+def authorNames(records: list, linked: bool = False):
+    """
+    Collect the distinct author names with the records they occur in.
+
+    Args:
+        records (list): Parsed records (data/ggd.json).
+        linked (bool): Also include authors that already have thesaurus or
+            Wikidata links.
+
+    Returns:
+        dict: name --> AuthorName
+    """
+
+    names = dict()
+
+    for r in records:
+        for a in r.get("author", []):
+            if not linked and (a["thesaurus"] or a.get("wikidata")):
+                continue
+
+            if a["person"] not in names:
+                names[a["person"]] = AuthorName(a["person"])
+            names[a["person"]].records.append(r["id"])
+
+    return names
+
+
+def curatedClusters(author2id: dict, authorSameAs: dict):
+    """
+    The curated clusters of the author names.
+
+    Args:
+        author2id (dict): name --> {record id: cluster}, data/author2id.json.
+        authorSameAs (dict): cluster --> {name: [record ids]},
+            data/authorSameAs.json.
+
+    Returns:
+        dict: name --> frozenset of cluster numbers (str). A name in more
+            than one cluster was split by the curators.
+    """
+
+    clusters = dict()
+
+    for name, records in author2id.items():
+        clusters.setdefault(name, set()).update(str(n) for n in records.values())
+
+    for n, group in authorSameAs.items():
+        for name in group:
+            clusters.setdefault(name, set()).add(n)
+
+    return {name: frozenset(c) for name, c in clusters.items()}
+
+
+def candidateGroups(
+    names: dict,
+    blocking="surname",
+    scorer="components",
+    threshold: float = 0.85,
+    maxBlock: int = 1000,
+    curated: dict = None,
+):
+    """
+    Group author names that probably refer to the same person.
+
+    Names are only compared within a block (see BLOCKING), so the number of
+    comparisons grows with the block sizes instead of quadratically with
+    the number of names. Pairs scoring at least `threshold` are joined, and
+    groups are the connected components of those pairs.
+
+    Args:
+        names (dict): name --> AuthorName, see `authorNames`.
+        blocking: Name of a blocking function in BLOCKING, or a function.
+        scorer: Name of a scoring function in SCORERS, or a function.
+        threshold (float): Minimum score of a pair.
+        maxBlock (int): Larger blocks (too common keys) are skipped.
+        curated (dict): name --> curated clusters, see `curatedClusters`.
+            Pairs of names in the same curated cluster are not compared.
+
+    Returns:
+        list: groups, each a sorted list of names.
+    """
+
+    curated = curated or dict()
+
+    blocking = BLOCKING.get(blocking, blocking)
+    scorer = SCORERS.get(scorer, scorer)
+
+    blocks = dict()
+    for author in names.values():
+        for key in blocking(author):
+            blocks.setdefault(key, []).append(author)
+
+    parent = {name: name for name in names}
+
+    def find(name):
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    compared = set()
+    for block in blocks.values():
+        if len(block) < 2 or len(block) > maxBlock:
+            continue
+
+        for a, b in combinations(block, 2):
+            pair = (a.name, b.name) if a.name < b.name else (b.name, a.name)
+            if pair in compared:
+                continue
+            compared.add(pair)
+
+            if curated.get(a.name) and curated.get(a.name) == curated.get(b.name):
+                continue  # already linked
+
+            if find(a.name) != find(b.name) and scorer(a, b) >= threshold:
+                parent[find(a.name)] = find(b.name)
+
+    groups = dict()
+    for name in names:
+        groups.setdefault(find(name), []).append(name)
+
+    return [sorted(group) for group in groups.values()]
+
+
+def toAuthorSameAs(groups: list, names: dict, curated: dict = None):
+    """
+    Groups in the authorSameAs.json format: {n: {name: [record ids]}}, for
+    the groups of names that occur in more than one record. Groups of which
+    all names are in the same curated cluster add nothing and are left out.
+    """
+
+    curated = curated or dict()
+    result = dict()
+
+    for group in sorted(groups):
+        clusters = {curated.get(name) for name in group}
+        if len(clusters) == 1 and None not in clusters:
+            continue
+
+        records = {name: sorted(set(names[name].records)) for name in group}
+
+        if sum(len(i) for i in records.values()) > 1:
+            result[str(len(result) + 1)] = records
+
+    return result
+
+
+def curatedConflicts(candidates: dict, curated: dict):
+    """
+    The candidate groups that join names of different curated clusters, or
+    contain a name that the curators split over several clusters.
+
+    Returns:
+        dict: {n: {name: [curated clusters]}}, n as in `candidates`.
+    """
+
+    conflicts = dict()
+
+    for n, group in candidates.items():
+        clusters = {name: curated.get(name, frozenset()) for name in group}
+
+        if len(frozenset().union(*clusters.values())) > 1:
+            conflicts[n] = {name: sorted(c) for name, c in clusters.items()}
+
+    return conflicts
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--json", default=JSONFILE, help="parsed records")
+    parser.add_argument("--destination", default=CANDIDATEFILE)
+    parser.add_argument("--blocking", default="surname", choices=list(BLOCKING))
+    parser.add_argument("--scorer", default="components", choices=list(SCORERS))
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--max-block", type=int, default=1000)
+    parser.add_argument("--conflicts", default=CONFLICTFILE)
+    parser.add_argument("--author2id", default=AUTHOR2ID, help="curated links")
+    parser.add_argument("--authorsameas", default=AUTHORSAMEAS, help="curated clusters")
+    parser.add_argument(
+        "--linked",
+        action="store_true",
+        help="also include authors with thesaurus or Wikidata links",
+    )
+    args = parser.parse_args()
+
+    curated = curatedClusters(loadJSON(args.author2id), loadJSON(args.authorsameas))
+
+    names = authorNames(loadJSON(args.json), linked=args.linked)
+    groups = candidateGroups(
+        names,
+        blocking=args.blocking,
+        scorer=args.scorer,
+        threshold=args.threshold,
+        maxBlock=args.max_block,
+        curated=curated,
+    )
+    candidates = toAuthorSameAs(groups, names, curated)
+    conflicts = curatedConflicts(candidates, curated)
+
+    print(
+        f"{len(names)} author names, {len(candidates)} candidate groups, "
+        f"{len(conflicts)} conflicting with curated links"
+    )
+
+    with open(args.destination, "w", encoding="utf-8") as outfile:
+        json.dump(candidates, outfile, indent=4, ensure_ascii=False)
+
+    with open(args.conflicts, "w", encoding="utf-8") as outfile:
+        json.dump(conflicts, outfile, indent=4, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare toRdf throughput with batched (BufferedGraph/addN) and per-triple
+Graph.add, and check that both runs produce isomorphic graphs.
+
+Usage (from the repository root):
+    python benchmarks/batching.py --json data/ggd.json --batchsize 100000
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from rdflib import Graph, BNode, URIRef
+from rdflib.compare import isomorphic
+
+from main import toRdf, JSONFILE
+
+# Skolem IRIs and random person URIs (uuid4) differ between runs by design
+RANDOM = re.compile(
+    r"(/\.well-known/genid/[^/]+$)"
+    r"|(/person/[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[0-9a-f]{4}-[0-9a-f]{12}$)"
+)
+
+
+def unskolemize(g):
+    def node(t):
+        if isinstance(t, URIRef) and RANDOM.search(t):
+            return BNode(t.rsplit("/", 1)[1])
+        return t
+
+    h = Graph()
+    for s, p, o in g:
+        h.add((node(s), p, node(o)))
+
+    return h
+
+
+def run(filepath: str, batchSize: int):
+
+    start = time.perf_counter()
+    g = toRdf(filepath=filepath, target=None, batchSize=batchSize)
+    elapsed = time.perf_counter() - start
+
+    return g, elapsed
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--json", default=JSONFILE)
+    parser.add_argument("--batchsize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    gBatched, tBatched = run(args.json, args.batchsize)
+    gSingle, tSingle = run(args.json, None)
+
+    print(f"batched ({args.batchsize}): {tBatched:8.2f}s  {len(gBatched)} triples")
+    print(f"per-triple add:    {tSingle:8.2f}s  {len(gSingle)} triples")
+    print("speed-up:", round(tSingle / tBatched, 2))
+
+    same = isomorphic(unskolemize(gBatched), unskolemize(gSingle))
+    print("isomorphic:", same)
+
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
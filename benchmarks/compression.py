@@ -0,0 +1,118 @@
+"""
+End-to-end benchmark of the pipeline with uncompressed, gzip and zstd files:
+time and bytes written for the dump --> data/ggd.json --> rdf/ggd.trig steps.
+
+Usage (from the repository root):
+    python benchmarks/compression.py --codecs none gz zst --levels 1 3 6
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from ggd2json import GGDFILE, getRecords, parseRecord
+from utils import openFile, loadJSON, compression, COMPRESSIONLEVEL
+
+EXTENSIONS = {
+    "none": "",
+    "gz": ".gz",
+    "zst": ".zst",
+}
+
+
+def run(dump: str, directory: str, extension: str, level: int, rdf: bool):
+    """Run the steps on a (compressed) copy of the dump, return the timings."""
+
+    # the dump as it would be shipped, not timed
+    source = os.path.join(directory, "ggd.dmp" + extension)
+    with open(dump, "rb") as infile, openFile(source, "wb", level=level) as outfile:
+        shutil.copyfileobj(infile, outfile)
+
+    jsonfile = os.path.join(directory, "ggd.json" + extension)
+    target = os.path.join(directory, "ggd.trig" + extension)
+
+    result = {"dump bytes": os.path.getsize(source)}
+
+    start = time.perf_counter()
+    records = [parseRecord(r) for r in getRecords(source)]
+    with openFile(jsonfile, "w", level=level) as outfile:
+        json.dump(records, outfile, indent=4)
+    result["parse s"] = time.perf_counter() - start
+    result["json bytes"] = os.path.getsize(jsonfile)
+
+    start = time.perf_counter()
+    assert len(loadJSON(jsonfile)) == len(records)
+    result["load s"] = time.perf_counter() - start
+
+    if rdf:
+        from main import toRdf
+
+        start = time.perf_counter()
+        toRdf(
+            jsonfile,
+            target,
+            sameAsStore=os.path.join(directory, "sameAs.sqlite"),
+            level=level,
+        )
+        result["convert s"] = time.perf_counter() - start
+        result["trig bytes"] = os.path.getsize(target)
+
+    return result
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dump", default=GGDFILE)
+    parser.add_argument(
+        "--codecs", nargs="+", default=list(EXTENSIONS), choices=list(EXTENSIONS)
+    )
+    parser.add_argument(
+        "--levels", type=int, nargs="+", help="default: the level of each codec"
+    )
+    parser.add_argument(
+        "--no-rdf", action="store_true", help="skip the conversion to RDF"
+    )
+    args = parser.parse_args()
+
+    rows = []
+    for codec in args.codecs:
+        extension = EXTENSIONS[codec]
+
+        if codec == "zst":
+            try:
+                import zstandard
+            except ImportError:
+                print("zstandard is not installed, skipping zst")
+                continue
+
+        if codec == "none":
+            levels = [None]
+        else:
+            levels = args.levels or [COMPRESSIONLEVEL[compression("ggd" + extension)]]
+
+        for level in levels:
+            with tempfile.TemporaryDirectory() as directory:
+                result = run(args.dump, directory, extension, level, not args.no_rdf)
+            rows.append((codec, level, result))
+
+    columns = list(rows[0][2]) if rows else []
+    print(f"{'codec':<6}{'level':>6}" + "".join(f"{c:>14}" for c in columns))
+    for codec, level, result in rows:
+        print(
+            f"{codec:<6}{'' if level is None else level:>6}"
+            + "".join(
+                f"{result[c]:>14.3f}" if c.endswith(" s") else f"{result[c]:>14,}"
+                for c in columns
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Start-up benchmark: load the enrichment tables of ggd2json one after another
+or concurrently in a process pool.
+
+Usage (from the repository root):
+    python benchmarks/loading.py --workers 1 2 4 --repeat 5
+
+The pool is opt-in: ggd2json loads its tables serially at import time,
+unless GGD_WORKERS is set, e.g. GGD_WORKERS=4 python ggd2json.py.
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from utils import loadJSONFiles
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count()])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    filepaths = sorted(glob.glob("data/id2*.json")) + [
+        "data/ggd2stcn.json",
+        "data/place2ecartico.json",
+        "data/impressum_place_year.json",
+    ]
+
+    reference = loadJSONFiles(filepaths, workers=1)
+
+    print(f"{len(filepaths)} files, {os.cpu_count()} cpus")
+    for workers in args.workers:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            tables = loadJSONFiles(filepaths, workers=workers)
+            timings.append(time.perf_counter() - start)
+
+        assert tables == reference
+        print(f"workers={workers:<3} best {min(timings):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
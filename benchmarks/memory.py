@@ -0,0 +1,44 @@
+"""
+Memory report of the enrichment tables and data/ggd.json, loaded with and
+without string interning.
+
+Usage (from the repository root):
+    python benchmarks/memory.py
+"""
+
+import os
+import sys
+import glob
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from utils import loadJSON, memoryReport
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--json", default="data/ggd.json")
+    args = parser.parse_args()
+
+    filepaths = sorted(glob.glob("data/id2*.json")) + [
+        "data/ggd2stcn.json",
+        "data/place2ecartico.json",
+        "data/impressum_place_year.json",
+    ]
+    if os.path.exists(args.json):
+        filepaths.append(args.json)
+
+    totals = dict()
+    for intern in (False, True):
+        print(f"\n## intern={intern}")
+        tables = {os.path.basename(f): loadJSON(f, intern=intern) for f in filepaths}
+        totals[intern] = memoryReport(tables)
+        del tables
+
+    print(f"\nReduction: {1 - totals[True] / totals[False]:.1%}")
+
+
+if __name__ == "__main__":
+    main()
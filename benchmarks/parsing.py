@@ -0,0 +1,71 @@
+"""
+Time the parsing of the dump per record (getRecords/parseRecord) with the
+cyclic garbage collector on and paused (utils.pausedGC), and in batch mode
+(parseRecords, collector paused), on a synthetic dump that repeats the real
+dump a number of times.
+
+Usage (from the repository root):
+    python benchmarks/parsing.py --dmp "data/Gelegenheidsgedichten_Golden Agents_KB.dmp" --times 100
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from ggd2json import GGDFILE, getRecords, parseRecord, parseRecords
+from utils import pausedGC
+
+
+def syntheticDump(filepath: str, times: int):
+
+    with open(filepath, encoding="utf-8-sig") as infile:
+        data = infile.read()
+
+    outfile = tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8-sig", suffix=".dmp", delete=False
+    )
+    with outfile:
+        outfile.write("\n$\n".join([data] * times))
+
+    return outfile.name
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dmp", default=GGDFILE)
+    parser.add_argument("--times", type=int, default=100)
+    args = parser.parse_args()
+
+    filepath = syntheticDump(args.dmp, args.times)
+
+    try:
+        start = time.perf_counter()
+        records = [parseRecord(r) for r in getRecords(filepath)]
+        tEnabled = time.perf_counter() - start
+
+        with pausedGC():
+            start = time.perf_counter()
+            paused = [parseRecord(r) for r in getRecords(filepath)]
+            tPaused = time.perf_counter() - start
+
+        with pausedGC():
+            start = time.perf_counter()
+            batched = parseRecords(getRecords(filepath))
+            tBatched = time.perf_counter() - start
+    finally:
+        os.remove(filepath)
+
+    print(f"{len(records)} records")
+    print(f"gc enabled: {tEnabled:8.2f}s")
+    print(f"gc paused:  {tPaused:8.2f}s")
+    print(f"batch mode: {tBatched:8.2f}s")
+    print("equal output:", records == paused == batched)
+
+
+if __name__ == "__main__":
+    main()
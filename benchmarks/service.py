@@ -0,0 +1,106 @@
+"""
+Load test of a running lookup service (service.py): latency percentiles of
+record lookups over keep-alive connections.
+
+Usage (from the repository root, with `python service.py` running):
+    python benchmarks/service.py --requests 10000 --connections 16
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from records import RecordIndex, JSONFILE, INDEXPATH
+
+
+async def request(reader, writer, host: str, path: str):
+
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    await writer.drain()
+
+    status = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+
+    return int(status.split()[1])
+
+
+async def client(host: str, port: int, paths: list, latencies: list):
+    """One keep-alive connection that requests `paths` one after another."""
+
+    reader, writer = await asyncio.open_connection(host, port)
+
+    for path in paths:
+        start = time.perf_counter()
+        status = await request(reader, writer, host, path)
+        latencies.append(time.perf_counter() - start)
+        assert status == 200, f"{path}: {status}"
+
+    writer.close()
+
+
+def percentile(values: list, p: float):
+
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def loadTest(host, port, paths, connections):
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[
+            client(host, port, paths[i::connections], latencies)
+            for i in range(connections)
+        ]
+    )
+    elapsed = time.perf_counter() - start
+
+    return sorted(latencies), elapsed
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--json", default=JSONFILE)
+    parser.add_argument("--index", default=INDEXPATH)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument(
+        "--ids", type=int, default=1_000, help="number of distinct records asked"
+    )
+    args = parser.parse_args()
+
+    ids = list(RecordIndex.fromFile(args.json, args.index).indexes["id"])
+    random.seed(42)
+    ids = random.sample(ids, min(args.ids, len(ids)))
+    paths = [f"/record/{random.choice(ids)}" for _ in range(args.requests)]
+
+    latencies, elapsed = asyncio.run(
+        loadTest(args.host, args.port, paths, args.connections)
+    )
+
+    print(
+        f"{len(latencies)} requests in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s)"
+    )
+    for p in (50, 90, 99, 99.9):
+        print(f"p{p:<5} {percentile(latencies, p) * 1000:8.2f} ms")
+    print(f"max    {latencies[-1] * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compare the time until the first SPARQL answer when parsing rdf/ggd.trig into
+a memory graph against opening a persistent store filled by `toRdf`.
+
+Usage (from the repository root):
+    python benchmarks/store_startup.py --trig rdf/ggd.trig --path rdf/ggd.store
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from rdflib import Dataset
+
+from store import openStore, STOREPATH, STORES
+
+QUERY = """
+PREFIX schema: <https://schema.org/>
+SELECT (COUNT(?book) AS ?n) WHERE { ?book a schema:Book . }
+"""
+
+
+def fromTrig(path: str):
+
+    start = time.perf_counter()
+    ds = Dataset(default_union=True)
+    ds.parse(path, format="trig")
+    loaded = time.perf_counter()
+    result = list(ds.query(QUERY))
+    done = time.perf_counter()
+
+    return loaded - start, done - start, result
+
+
+def fromStore(path: str, store: str):
+
+    start = time.perf_counter()
+    ds = openStore(path, store=store)
+    loaded = time.perf_counter()
+    result = list(ds.query(QUERY))
+    done = time.perf_counter()
+    ds.close()
+
+    return loaded - start, done - start, result
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--trig", default="rdf/ggd.trig")
+    parser.add_argument("--path", default=STOREPATH)
+    parser.add_argument("--store", default="Oxigraph", choices=list(STORES))
+    args = parser.parse_args()
+
+    for name, (load, total, result) in (
+        (f"store ({args.store})", fromStore(args.path, args.store)),
+        ("trig", fromTrig(args.trig)),
+    ):
+        print(
+            f"{name:20} open/parse: {load:8.2f}s  first answer: {total:8.2f}s  "
+            f"books: {result[0][0]}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of unique() over the calls of a full toRdf run: plain uuid5
+as before, memoized uuid5 (version 1) and memoized xxh3 (version 2).
+
+Usage (from the repository root):
+    python benchmarks/unique.py --json data/ggd.json
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from rdflib import BNode, URIRef
+
+import main as conversion
+
+
+def recordCalls(filepath: str):
+    """Run toRdf once and record the arguments of every unique() call."""
+
+    calls = []
+    original = conversion.unique
+
+    def recorder(*args, ns=None, version=None):
+        calls.append((args, ns))
+        return original(*args, ns=ns, version=version)
+
+    conversion.unique = recorder
+    try:
+        conversion.toRdf(filepath=filepath, target=None)
+    finally:
+        conversion.unique = original
+
+    return calls
+
+
+def uncached(*args, ns=None):
+
+    identifier = "".join(str(i) for i in args)
+    unique_id = uuid.uuid5(uuid.NAMESPACE_X500, identifier)
+
+    if ns:
+        return URIRef(ns + str(unique_id))
+    else:
+        return BNode(unique_id)
+
+
+def replay(calls, f, **kwargs):
+
+    start = time.perf_counter()
+    for args, ns in calls:
+        f(*args, ns=ns, **kwargs)
+
+    return time.perf_counter() - start
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--json", default=conversion.JSONFILE)
+    args = parser.parse_args()
+
+    # empty identifiers get a random uuid4 and are never cached
+    calls = [c for c in recordCalls(args.json) if "".join(str(i) for i in c[0])]
+    distinct = len({("".join(str(i) for i in a), ns) for a, ns in calls})
+    print(f"{len(calls)} calls, {distinct} distinct identifiers")
+
+    print(f"uuid5, no cache:  {replay(calls, uncached):8.3f}s")
+
+    conversion.uniqueTerm.cache_clear()
+    print(f"uuid5, memoized:  {replay(calls, conversion.unique, version=1):8.3f}s")
+
+    try:
+        import xxhash
+    except ImportError:
+        print("xxh3, memoized:   skipped (xxhash is not installed)")
+    else:
+        conversion.uniqueTerm.cache_clear()
+        print(f"xxh3, memoized:   {replay(calls, conversion.unique, version=2):8.3f}s")
+
+    print(conversion.uniqueTerm.cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
-import json
 from rdflib import Graph, Namespace, OWL, Literal, URIRef, BNode, XSD, RDFS
 from rdfalchemy import rdfSubject, rdfSingle, rdfMultiple
 
+from etypes import getEventTypes
+
 skos = Namespace("http://www.w3.org/2004/02/skos/core#")
 
 
@@ -18,32 +19,21 @@ class Concept(rdfSubject):
 
 def main(filepath, destination='data/etypes.ttl'):
 
-    g = rdfSubject.db = Graph()
-
-    with open(filepath) as infile:
-        data = json.load(infile)
-
-    for uri in data:
+    g = Graph()
 
-        concept = Concept(URIRef(uri))
+    # Concept bound to this graph, instead of the global rdfSubject.db
+    concept = type('Concept', (Concept,), {'db': g})
 
-        # Labels
-        prefLabels = []
-        for lang in data[uri]['prefLabel']:
-            prefLabels.append(Literal(data[uri]['prefLabel'][lang], lang=lang))
-        concept.prefLabel = prefLabels
+    eventTypes = getEventTypes(filepath)
 
-        # Broader / Narrower
-        broaders = []
-        for broader in data[uri]['broader']:
-            broaders.append(URIRef(broader))
-        concept.broader = broaders
+    for uri in eventTypes.concepts:
 
-        # Matches
-        matches = []
-        for match in data[uri]['relatedMatch']:
-            matches.append(URIRef(match))
-        concept.relatedMatch = matches
+        concept(
+            uri,
+            prefLabel=list(eventTypes.prefLabels[uri]),
+            broader=list(eventTypes.broader[uri]),
+            relatedMatch=list(eventTypes.relatedMatch[uri]),
+        )
 
     g.bind('skos', skos)
     g.serialize(destination=destination, format='turtle')
@@ -0,0 +1,124 @@
+import json
+from functools import lru_cache
+
+from rdflib import Namespace, Literal, URIRef
+
+ETYPEFILE = "data/eventTypes.json"
+
+# Event types that are not (yet) in the thesaurus get a URI on this namespace
+gaThes = Namespace("https://data.goldenagents.org/thesaurus/")
+
+
+class EventTypeRegistry:
+    """
+    Event type thesaurus from eventTypes.json with precomputed lookups.
+
+    Holds the label to URI mapping (Dutch and English prefLabels), the
+    bilingual prefLabels as language tagged Literals and the transitive
+    skos:broader closure in both directions, so that hierarchy questions
+    ("all event types under jubileum") are plain set lookups.
+    """
+
+    def __init__(self, filepath: str = ETYPEFILE):
+
+        with open(filepath) as infile:
+            data = json.load(infile)
+
+        self.concepts = tuple(URIRef(uri) for uri in data)
+
+        self.prefLabels = dict()
+        self.broader = dict()
+        self.relatedMatch = dict()
+        self.label2uri = dict()
+
+        for uri in data:
+            concept = URIRef(uri)
+
+            self.prefLabels[concept] = tuple(
+                Literal(label, lang=lang)
+                for lang, label in data[uri]["prefLabel"].items()
+            )
+            self.broader[concept] = tuple(URIRef(i) for i in data[uri]["broader"])
+            self.relatedMatch[concept] = tuple(
+                URIRef(i) for i in data[uri]["relatedMatch"]
+            )
+
+            for label in data[uri]["prefLabel"].values():
+                self.label2uri.setdefault(label.lower(), concept)
+
+        # transitive closure of skos:broader and its inverse
+        self.broaderTransitive = dict()
+        for concept in self.concepts:
+            ancestors = set()
+            stack = list(self.broader[concept])
+            while stack:
+                b = stack.pop()
+                if b not in ancestors:
+                    ancestors.add(b)
+                    stack += self.broader.get(b, ())
+            self.broaderTransitive[concept] = frozenset(ancestors)
+
+        narrower = {concept: {concept} for concept in self.concepts}
+        for concept, ancestors in self.broaderTransitive.items():
+            for b in ancestors:
+                narrower.setdefault(b, {b}).add(concept)
+        self.narrowerTransitive = {k: frozenset(v) for k, v in narrower.items()}
+
+    def uri(self, label: str):
+        """
+        Return the URI for an event type label from the records.
+
+        Labels that are not in the thesaurus get a URI on the gaThes namespace.
+        """
+
+        concept = self.label2uri.get(label.lower())
+
+        if concept is None:
+            concept = gaThes.term(label.lower().replace(" ", "").replace(",", "en"))
+            self.label2uri[label.lower()] = concept
+
+        return concept
+
+    def under(self, concept):
+        """
+        Return the concept and all its (transitively) narrower concepts.
+
+        Args:
+            concept: A concept URI or label (e.g. "jubileum").
+
+        Returns:
+            frozenset: URIs of the concept and its narrower concepts.
+        """
+
+        if not isinstance(concept, URIRef):
+            concept = self.uri(concept)
+
+        return self.narrowerTransitive.get(concept, frozenset([concept]))
+
+    def recordsUnder(self, records, concept):
+        """
+        Return the records of which one of the event types falls under a
+        concept, e.g. all poems for an anniversary (jubileum).
+
+        Args:
+            records (list): Parsed records (data/ggd.json).
+            concept: A concept URI or label.
+
+        Returns:
+            list: The matching records.
+        """
+
+        concepts = self.under(concept)
+
+        return [
+            r
+            for r in records
+            if any(self.uri(t) in concepts for t in r["event"]["type"] if t)
+        ]
+
+
+@lru_cache(maxsize=None)
+def getEventTypes(filepath: str = ETYPEFILE):
+    """Return the shared EventTypeRegistry for a thesaurus file."""
+
+    return EventTypeRegistry(filepath)
@@ -1,11 +1,24 @@
 import os
+import re
+import sys
 import json
+import mmap
+import argparse
 from datetime import datetime
 import calendar
-from collections import defaultdict
+from types import MappingProxyType
+
+from utils import loadJSONFiles, pausedGC, openFile, compression
+from textindex import updateTextIndex, TEXTINDEX
 
 GGDFILE = "data/Gelegenheidsgedichten_Golden Agents_KB.dmp"
 
+# Processes for loading the enrichment tables at import, e.g. GGD_WORKERS=4.
+# Opt-in: forking while a module is imported is only safe in a plain script
+# (python ggd2json.py), not in a threaded program that imports ggd2json.
+WORKERS = int(os.environ.get("GGD_WORKERS", 1))
+VALIDATIONPATH = "data/validation.json"
+
 KEYS = {
     "AAR": "event",
     "ABS": "description",
@@ -69,93 +82,351 @@ languages = {
     "latijn": "iso639-3:lat",
 }
 
-with open("data/ggd2stcn.json") as infile:
-    GGD2STCN = json.load(infile)
+(
+    GGD2STCN,
+    ID2PERSON,
+    ID2ECARTICO,
+    ID2AUTHOR,
+    ID2PRINTER,
+    ID2GENDER,
+    ID2DOOP,
+    ID2OTR,
+    ID2BEGRAAF,
+    ID2RKD,
+    ID2WIKIDATA,
+    ID2MELODIE,
+    ID2NA_HV,
+    ID2NA_BOEDEL,
+    ID2NA_TESTAMENT,
+    PLACE2ECARTICO,
+    IMPRESSUMDATA,
+) = loadJSONFiles(
+    [
+        "data/ggd2stcn.json",
+        "data/id2person.json",
+        "data/id2ecartico.json",
+        "data/id2author.json",
+        "data/id2printer.json",
+        "data/id2gender.json",
+        "data/id2doop.json",
+        "data/id2otr.json",
+        "data/id2begraaf.json",
+        "data/id2rkd.json",
+        "data/id2wikidata.json",
+        "data/id2melodie.json",
+        ## NA
+        "data/id2na_hv.json",
+        "data/id2na_boedel.json",
+        "data/id2na_testament.json",
+        "data/place2ecartico.json",
+        "data/impressum_place_year.json",
+    ],
+    workers=WORKERS,
+)
+
+
+def buildThesaurusIndex(**tables):
+    """
+    Build a read-only thesaurus index in one pass over the enrichment tables.
+
+    Args:
+        **tables: role class (person, author, printer) --> {recordID: {name: [uri]}}
+
+    Returns:
+        MappingProxyType: (recordID, role class, name) --> tuple of interned URIs
+    """
+
+    index = dict()
+
+    for roleClass, table in tables.items():
+        for ggdid, names in table.items():
+            for name, uris in names.items():
+                index[(ggdid, roleClass, name)] = tuple(sys.intern(i) for i in uris)
+
+    return MappingProxyType(index)
+
+
+ID2THESAURUS = buildThesaurusIndex(
+    person=ID2PERSON, author=ID2AUTHOR, printer=ID2PRINTER
+)
+
+
+def iterRawRecords(filepath: str):
+    """
+    Stream the records of the dump one at a time.
+
+    Yields:
+        list: The "KEY value" lines of a record.
+    """
+
+    lines = []
+
+    with openFile(filepath, encoding="utf-8-sig") as infile:
+        for line in infile:
+            line = line.rstrip("\n")
+
+            if line == "$":
+                if lines:
+                    yield lines
+                lines = []
+            elif line.strip():  # blank lines are skipped
+                lines.append(line)
+
+    if lines:
+        yield lines
+
+
+def parseRawRecord(lines: list):
+
+    d = dict()
+
+    for i in lines:
+        if not i.strip():
+            continue
+
+        key, value = i.split(" ", 1)
+        if "; " in value:
+            value = value.split("; ")
+
+        d[KEYS[key]] = value
+
+    return d
 
-with open("data/id2person.json") as infile:
-    ID2PERSON = json.load(infile)
 
-with open("data/id2ecartico.json") as infile:
-    ID2ECARTICO = json.load(infile)
+def getRecords(filepath: str):
 
-with open("data/id2author.json") as infile:
-    ID2AUTHOR = json.load(infile)
+    return [parseRawRecord(r) for r in iterRawRecords(filepath)]
 
-with open("data/id2printer.json") as infile:
-    ID2PRINTER = json.load(infile)
 
-with open("data/id2gender.json") as infile:
-    ID2GENDER = json.load(infile)
+def rawRecordID(lines: list):
+    """The REC id in the lines of a record, or None."""
 
-with open("data/id2doop.json") as infile:
-    ID2DOOP = json.load(infile)
+    for line in reversed(lines):
+        if line.startswith("REC "):
+            return line[4:]
 
-with open("data/id2otr.json") as infile:
-    ID2OTR = json.load(infile)
+    return None
 
-with open("data/id2begraaf.json") as infile:
-    ID2BEGRAAF = json.load(infile)
 
-with open("data/id2rkd.json") as infile:
-    ID2RKD = json.load(infile)
+class DumpIndex:
+    """
+    Random access to the records of the dump by REC id.
 
-with open("data/id2wikidata.json") as infile:
-    ID2WIKIDATA = json.load(infile)
+    The dump is scanned once for the byte range of every record. The ranges
+    are saved next to it (`<dump>.offsets.json`) and reused as long as the
+    dump does not change. A record is then read by parsing only its slice
+    of the memory-mapped file, and workers can be given byte ranges of
+    whole records (see `ranges`).
 
-with open("data/id2melodie.json") as infile:
-    ID2MELODIE = json.load(infile)
+    Records without a REC line cannot be looked up, and of a REC id that
+    occurs more than once only the first record can. Both are listed in
+    `problems` (as in the report of `validate`), and the byte ranges still
+    cover every record in the order of the dump.
 
-## NA
+    Args:
+        filepath (str): Path to the .dmp file.
+        indexPath (str): Path of the saved offsets.
+        strict (bool): Raise a ValueError if there are problems.
+    """
 
-with open("data/id2na_hv.json") as infile:
-    ID2NA_HV = json.load(infile)
+    SEPARATOR = re.compile(rb"^\$\r?$", re.MULTILINE)
+    RECID = re.compile(rb"^REC (.*?)\r?$", re.MULTILINE)
 
-with open("data/id2na_boedel.json") as infile:
-    ID2NA_BOEDEL = json.load(infile)
+    def __init__(self, filepath: str = GGDFILE, indexPath: str = None, strict=False):
 
-with open("data/id2na_testament.json") as infile:
-    ID2NA_TESTAMENT = json.load(infile)
+        if compression(filepath):
+            raise ValueError(f"{filepath} is compressed, an index needs a plain dump")
 
+        self.filepath = filepath
+        self.indexPath = indexPath or filepath + ".offsets.json"
 
-ID2THESAURUS = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-for ggdid in ID2PERSON:
-    for name in ID2PERSON[ggdid]:
-        ID2THESAURUS[ggdid]["person"][name] += ID2PERSON[ggdid][name]
-for ggdid in ID2AUTHOR:
-    for name in ID2AUTHOR[ggdid]:
-        ID2THESAURUS[ggdid]["author"][name] += ID2AUTHOR[ggdid][name]
-for ggdid in ID2PRINTER:
-    for name in ID2PRINTER[ggdid]:
-        ID2THESAURUS[ggdid]["printer"][name] += ID2PRINTER[ggdid][name]
+        with open(filepath, "rb") as infile:
+            self.mm = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
 
-with open("data/place2ecartico.json") as infile:
-    PLACE2ECARTICO = json.load(infile)
+        stat = os.stat(filepath)
+        self.signature = [stat.st_size, stat.st_mtime_ns]
 
-with open("data/impressum_place_year.json") as infile:
-    IMPRESSUMDATA = json.load(infile)
+        saved = None
+        if os.path.exists(self.indexPath):
+            with open(self.indexPath) as infile:
+                saved = json.load(infile)
 
+        if saved and saved["signature"] == self.signature and "spans" in saved:
+            self.offsets = {k: tuple(v) for k, v in saved["offsets"].items()}
+            self.spans = [tuple(span) for span in saved["spans"]]
+            self.problems = saved["problems"]
+        else:
+            self.offsets, self.spans, self.problems = self.scan()
+
+            with open(self.indexPath, "w") as outfile:
+                json.dump(
+                    {
+                        "signature": self.signature,
+                        "offsets": self.offsets,
+                        "spans": self.spans,
+                        "problems": self.problems,
+                    },
+                    outfile,
+                )
 
-def getRecords(filepath: str):
+        for kind, occurrences in self.problems.items():
+            print(f"{filepath}: {len(occurrences)} x {kind}")
+
+        if strict and self.problems:
+            raise ValueError(f"{filepath} has records that cannot be indexed")
+
+    def scan(self):
+        """
+        Find the byte range of every record.
+
+        Returns:
+            tuple: REC id --> (start, end) byte range, the (start, end) byte
+                ranges of all records in the order of the dump, and the
+                problems: {problem: [{"record": id, "value": value}]}.
+        """
+
+        offsets = dict()
+        spans = []
+        problems = dict()
+
+        start = 3 if self.mm[:3] == b"\xef\xbb\xbf" else 0  # utf-8 BOM
+        separators = [(m.start(), m.end()) for m in self.SEPARATOR.finditer(self.mm)]
+
+        for end, nextStart in separators + [(len(self.mm), len(self.mm))]:
+            if end > start and self.mm[start:end].strip():
+                spans.append((start, end))
+
+                match = self.RECID.search(self.mm[start:end])
+                recordID = match.group(1).decode("utf-8") if match else None
+
+                if recordID is None:
+                    kind, value = "missing field", "id"
+                elif recordID in offsets:
+                    kind, value = "duplicate record", recordID
+                else:
+                    offsets[recordID] = (start, end)
+                    kind = None
+
+                if kind:
+                    problems.setdefault(kind, []).append(
+                        {"record": recordID, "value": value, "range": [start, end]}
+                    )
+
+            start = nextStart + 1  # skip the newline after "$"
+
+        return offsets, spans, problems
+
+    def close(self):
+
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets)
 
-    records = []
+    def __contains__(self, recordID):
+        return recordID in self.offsets
 
-    with open(filepath, encoding="utf-8-sig") as infile:
-        data = infile.read()
+    def _lines(self, start: int, end: int):
 
-        for r in data.split("\n$\n"):
+        text = self.mm[start:end].decode("utf-8").replace("\r\n", "\n")
 
-            d = dict()
+        return [line for line in text.split("\n") if line.strip()]
 
-            for i in r.split("\n"):
-                key, value = i.split(" ", 1)
-                if "; " in value:
-                    value = value.split("; ")
+    def getRawRecord(self, recordID: str):
+        """The record with this REC id as by getRecords, or None."""
 
-                d[KEYS[key]] = value
+        if recordID not in self.offsets:
+            return None
 
-            records.append(d)
+        return parseRawRecord(self._lines(*self.offsets[recordID]))
 
-    return records
+    def getRecord(self, recordID: str):
+        """The record with this REC id as by parseRecord, or None."""
+
+        record = self.getRawRecord(recordID)
+
+        return parseRecord(record) if record is not None else None
+
+    def ranges(self, n: int):
+        """
+        Split the dump into at most `n` byte ranges of whole records, of
+        about the same size. All records are covered, also those that
+        cannot be looked up by REC id (see `problems`).
+
+        Returns:
+            list: (start, end) byte ranges, see `iterRange`.
+        """
+
+        spans = self.spans
+        if not spans:
+            return []
+
+        first = spans[0][0]
+        total = spans[-1][1] - first
+
+        ranges = []
+        start = None
+        for begin, end in spans:
+            if start is None:
+                start = begin
+            if end - first >= total * (len(ranges) + 1) / n:
+                ranges.append((start, end))
+                start = None
+
+        if start is not None:
+            ranges.append((start, spans[-1][1]))
+
+        return ranges
+
+    def iterRange(self, start: int, end: int):
+        """
+        Yield the raw records (lists of lines, as by iterRawRecords) in a
+        byte range from `ranges`, e.g. in a worker process.
+        """
+
+        position = start
+        for match in self.SEPARATOR.finditer(self.mm, start, end):
+            lines = self._lines(position, match.start())
+            if lines:
+                yield lines
+            position = match.end() + 1
+
+        lines = self._lines(position, end) if end > position else []
+        if lines:
+            yield lines
+
+
+# role --> role class in ID2THESAURUS, other roles are "person"
+ROLECLASSES = {None: "author", "Drukker/uitgever": "printer"}
+
+
+def splitRole(person: str):
+    """
+    Split a person entry as "Name. Role" into name and role.
+
+    Returns:
+        tuple: (name, role), role is None if the entry has no role.
+    """
+
+    if ". " in person:
+
+        if person.count(".") > 1:
+            # initials
+            person, role = person.rsplit(".", 1)
+            if not person.endswith((")", "van", "de")):  # e.g. (wed.)
+                person += "."
+        else:
+            person, role = person.rsplit(". ", 1)
+
+        return sys.intern(person.strip()), sys.intern(role.strip())
+    else:
+        return sys.intern(person), None
 
 
 def getPersons(persons, getRole=False, recordID=None):
@@ -167,28 +438,14 @@ def getPersons(persons, getRole=False, recordID=None):
 
     for person in persons:
 
-        if getRole and ". " in person:
-
-            if person.count(".") > 1:
-                # initials
-                person, role = person.rsplit(".", 1)
-                if not person.endswith((")", "van", "de")):  # e.g. (wed.)
-                    person += "."
-            else:
-                person, role = person.rsplit(". ", 1)
-
-            person = person.strip()
-            role = role.strip()
+        if getRole:
+            person, role = splitRole(person)
         else:
-            role = None
+            person, role = sys.intern(person), None
 
-        if recordID and recordID in ID2THESAURUS:
-            if role == "Drukker/uitgever":
-                thesaurus = ID2THESAURUS[recordID]["printer"].get(person, [])
-            elif role is None:
-                thesaurus = ID2THESAURUS[recordID]["author"].get(person, [])
-            else:
-                thesaurus = ID2THESAURUS[recordID]["person"].get(person, [])
+        if recordID:
+            roleClass = ROLECLASSES.get(role, "person")
+            thesaurus = list(ID2THESAURUS.get((recordID, roleClass, person), ()))
         else:
             thesaurus = []
 
@@ -320,7 +577,48 @@ def getEvent(record):
     }
 
 
-def parseRecord(record: dict):
+def isoDate(date: str):
+    """A date of the dump (dd-mm-yyyy) as yyyy-mm-dd."""
+
+    return datetime.strptime(date, "%d-%m-%Y").strftime("%Y-%m-%d")
+
+
+def parseRecords(records: list):
+    """
+    Batch mode of parseRecord, for many records at once (e.g. the whole
+    dump).
+
+    The created and modified dates, parsed with strptime, are converted once
+    per distinct value for the whole batch instead of once per record; the
+    other fields are parsed by parseRecord as before. Languages, places and
+    event types already are a single table lookup per value.
+
+    Args:
+        records (list): Raw records, as by getRecords.
+
+    Returns:
+        list: The parsed records.
+    """
+
+    isoDates = {
+        date: isoDate(date)
+        for date in {r[k] for r in records for k in ("created", "modified")}
+    }
+
+    return [parseRecord(r, isoDates) for r in records]
+
+
+def parseRecord(record: dict, isoDates: dict = None):
+    """
+    Parse a raw record (from getRecords) into the record of ggd.json.
+
+    Args:
+        record (dict): The raw record, changed in place.
+        isoDates (dict): Dates of the dump --> yyyy-mm-dd, see parseRecords.
+
+    Returns:
+        dict: The parsed record.
+    """
 
     # these fields should not have been split
     for k in ["title", "impressum", "collate", "description", "comments", "pages"]:
@@ -332,12 +630,11 @@ def parseRecord(record: dict):
 
     # dates
     record["date"] = record["date"]
-    record["created"] = datetime.strptime(record["created"], "%d-%m-%Y").strftime(
-        "%Y-%m-%d"
-    )
-    record["modified"] = datetime.strptime(record["modified"], "%d-%m-%Y").strftime(
-        "%Y-%m-%d"
-    )
+    for k in ["created", "modified"]:
+        if isoDates and record[k] in isoDates:
+            record[k] = isoDates[record[k]]
+        else:
+            record[k] = isoDate(record[k])
 
     # event
     record["event"] = getEvent(record)
@@ -435,15 +732,223 @@ def parseRecord(record: dict):
     return record
 
 
-def main(filepath: str):
+# e.g. 1781-02-01, 1781-02-00, 178X-00-00, 17XX-00-00, 1781-02-01-5-c
+DATEPATTERN = re.compile(r"^(\d\d)(\d\d|\dX|XX)-(\d\d)-(\d\d)(-.+)?$", re.IGNORECASE)
+
+# Problems that make the conversion fail. Others are reported as warnings.
+FATAL = {
+    "malformed line",
+    "unknown field",
+    "missing field",
+    "date",
+    "created",
+    "modified",
+    "place",
+    "impressum place",
+    "language",
+}
+
+
+def checkDate(date: str):
+
+    match = DATEPATTERN.match(date)
+    if not match:
+        return False
+
+    century, years, month, day, _ = match.groups()
+    month, day = int(month), int(day)
+
+    if "X" in years.upper():
+        return month == 0 and day == 0
+    elif month > 12 or (month == 0 and day != 0):
+        return False
+    elif day:
+        _, lastday = calendar.monthrange(int(century + years), month)
+        return day <= lastday
+    else:
+        return True
+
+
+def validate(filepath: str):
+    """
+    Check the whole dump against the lookup tables before the conversion.
+
+    Every place, impressum place, language, person role and date form is
+    checked, so that all problems are reported at once instead of the first
+    one ending a long run with a KeyError.
+
+    Args:
+        filepath (str): Path to the .dmp file.
+
+    Returns:
+        dict: {"errors": {problem: [...]}, "warnings": {problem: [...]}} with
+            a {"record": id, "value": value} entry per occurrence.
+    """
+
+    placeKeys = frozenset(PLACE2ECARTICO)
+    languageKeys = frozenset(languages)
 
-    records = getRecords(filepath)
+    report = {"errors": dict(), "warnings": dict()}
+    recordIDs = set()
 
-    records = [parseRecord(r) for r in records]
+    def problem(kind, recordID, value):
+        level = "errors" if kind in FATAL else "warnings"
+        report[level].setdefault(kind, []).append({"record": recordID, "value": value})
 
-    with open("data/ggd.json", "w", encoding="utf-8") as outfile:
+    for lines in iterRawRecords(filepath):
+
+        fields = dict()
+        malformed = []
+        for line in lines:
+            key, sep, value = line.partition(" ")
+            if not sep:
+                malformed.append(("malformed line", line))
+            elif key not in KEYS:
+                malformed.append(("unknown field", key))
+            else:
+                fields[KEYS[key]] = value
+
+        recordID = fields.get("id")
+
+        for kind, value in malformed:
+            problem(kind, recordID, value)
+
+        if recordID in recordIDs:
+            problem("duplicate record", recordID, recordID)
+        elif recordID is not None:
+            recordIDs.add(recordID)
+
+        for k in ["id", "date", "created", "modified", "language"]:
+            if k not in fields:
+                problem("missing field", recordID, k)
+
+        if "date" in fields and not checkDate(fields["date"]):
+            problem("date", recordID, fields["date"])
+
+        for k in ["created", "modified"]:
+            if k in fields:
+                try:
+                    datetime.strptime(fields[k], "%d-%m-%Y")
+                except ValueError:
+                    problem(k, recordID, fields[k])
+
+        for place in fields["place"].split("; ") if fields.get("place") else []:
+            if place not in placeKeys:
+                problem("place", recordID, place)
+
+        impressumPlace = IMPRESSUMDATA.get(recordID, {}).get("place")
+        if impressumPlace and impressumPlace not in placeKeys:
+            problem("impressum place", recordID, impressumPlace)
+
+        for language in fields.get("language", "").split("; "):
+            if language and language not in languageKeys:
+                problem("language", recordID, language)
+
+        # the role decides in which thesaurus table (ROLECLASSES) a person is
+        # looked up, links listed under another role class would be lost
+        for person in fields["person"].split("; ") if fields.get("person") else []:
+            name, role = splitRole(person)
+            if not role:
+                problem("role", recordID, person)
+                continue
+
+            roleClass = ROLECLASSES.get(role, "person")
+            if (recordID, roleClass, name) not in ID2THESAURUS and any(
+                (recordID, c, name) in ID2THESAURUS
+                for c in ("person", "printer")
+                if c != roleClass
+            ):
+                problem("role class", recordID, person)
+
+    return report
+
+
+def main(
+    filepath: str,
+    destination: str = "data/ggd.json",
+    level: int = None,
+    validation: str = VALIDATIONPATH,
+    strict: bool = True,
+):
+    """
+    Validate and parse the dump and write the records as JSON.
+
+    The dump and the JSON file can be compressed (.gz or .zst).
+
+    Args:
+        filepath (str): Path to the dump.
+        destination (str): Path of the records JSON file.
+        level (int): Compression level of the destination.
+        validation (str): Path of the validation report, None to only print
+            the summary.
+        strict (bool): Stop with a ValueError if the dump has errors. If
+            False, the errors are only reported (warn-only) and the records
+            that have them are left out.
+    """
+
+    report = validate(filepath)
+    if validation:
+        with openFile(validation, "w") as outfile:
+            json.dump(report, outfile, indent=4)
+
+    for severity, problems in report.items():
+        for kind, occurrences in problems.items():
+            print(f"{severity}: {len(occurrences)} x {kind}")
+
+    if report["errors"] and strict:
+        n = sum(len(occurrences) for occurrences in report["errors"].values())
+        raise ValueError(
+            f"The dump has {n} problems that would stop the conversion"
+            + (f", see {validation}" if validation else "")
+        )
+
+    skip = set()
+    if report["errors"] and not strict:
+        skip = {o["record"] for problems in report["errors"].values() for o in problems}
+        print(f"Leaving out {len(skip)} records with errors")
+
+    with pausedGC():
+        records = parseRecords(
+            [
+                parseRawRecord(r)
+                for r in iterRawRecords(filepath)
+                if not skip or rawRecordID(r) not in skip
+            ]
+        )
+
+    with openFile(destination, "w", level=level) as outfile:
         json.dump(records, outfile, indent=4)
 
+    # full text search index, only changed records are tokenized again
+    changed = updateTextIndex(records, TEXTINDEX)
+    print(f"Text index: {changed} records added, changed or removed")
+
 
 if __name__ == "__main__":
-    main(filepath=GGDFILE)
+    parser = argparse.ArgumentParser(
+        description=main.__doc__.splitlines()[1],
+        epilog="Set GGD_WORKERS=n to load the enrichment tables in n processes.",
+    )
+    parser.add_argument("--dump", default=GGDFILE)
+    parser.add_argument("--destination", default="data/ggd.json")
+    parser.add_argument("--validation", default=VALIDATIONPATH)
+    parser.add_argument(
+        "--level",
+        type=int,
+        help="compression level for a .gz or .zst destination "
+        "(default: gzip 6, zstd 3)",
+    )
+    parser.add_argument(
+        "--warn-only",
+        action="store_true",
+        help="report validation errors without stopping",
+    )
+    args = parser.parse_args()
+
+    main(
+        filepath=args.dump,
+        destination=args.destination,
+        validation=args.validation,
+        strict=not args.warn_only,
+        level=args.level,
+    )
@@ -1,13 +1,23 @@
+import os
 import re
 import json
 import uuid
-from itertools import count, permutations
-from collections import defaultdict
+import argparse
+from functools import lru_cache
+from itertools import count
 
 from rdflib import Graph, Namespace, OWL, Literal, URIRef, BNode, XSD, RDFS, RDF
 from rdflib.term import skolem_genid
 from rdfalchemy import rdfSubject, rdfSingle, rdfMultiple
 
+from store import loadGraph, BufferedGraph, STORES, STOREPATH
+from etypes import getEventTypes
+from utils import loadJSON, normaliseName, openFile, stripCompression, compression
+from stats import writeStatistics, statisticsPath
+from sameas import SameAsStore, sameAsGroups, SAMEASPATH
+from partition import writePartitions, PARTITIONSIZE
+from writers import writeTargets
+
 # http://data.bibliotheken.nl/id/dataset/ggd/
 ggd = Namespace("https://data.goldenagents.org/datasets/ggd/")
 ggddoc = Namespace("https://data.goldenagents.org/datasets/ggd/")
@@ -18,7 +28,6 @@ sem = Namespace("http://semanticweb.cs.vu.nl/2009/11/sem/")
 pnv = Namespace("https://w3id.org/pnv#")
 
 kbdef = Namespace("http://data.bibliotheken.nl/def#")
-gaThes = Namespace("https://data.goldenagents.org/thesaurus/")
 
 ggdItem = Namespace("https://data.goldenagents.org/datasets/ggd/item/")
 ggdEvent = Namespace("https://data.goldenagents.org/datasets/ggd/event/")
@@ -28,6 +37,12 @@ ggdPerson = Namespace("https://data.goldenagents.org/datasets/ggd/person/")
 
 JSONFILE = "data/ggd.json"
 
+# Hash version for unique(). Version 1 (uuid5) minted all URIs so far, so it
+# stays the default. Version 2 (xxh3-128, needs the xxhash package) is a
+# faster non-cryptographic hash and yields different, but equally stable, ids.
+UNIQUE_VERSION = 1
+UNIQUE_CACHESIZE = 2**18
+
 
 class Thing(rdfSubject):
     rdf_type = None
@@ -185,14 +200,153 @@ class MusicComposition(Thing):
     lyrics = rdfMultiple(schema.lyrics)
 
 
-def unique(*args, ns=None):
+class EntityRegistry:
+    """
+    Emit-once registry for entities that many records share (places, event
+    types, role types, melodies, persons and printers).
+
+    An entity is made once per class and uri: a uri that is both a Person
+    and an Organization (a KB thesaurus entry of an author who also printed)
+    gets both types and the properties of both. Properties are set as by
+    constructing the entity on every occurrence (the last occurrence wins),
+    but a property is only set again when its value changed. Links (e.g.
+    another musicArrangement or sameAs) are added next to the existing ones
+    on every occurrence, instead of replacing them.
+
+    With a graph `g`, all entities made through the registry (also by `new`)
+    are written to `g` instead of to the global rdfSubject.db.
+
+    Args:
+        g (Graph): Graph for the entities, by default rdfSubject.db.
+    """
+
+    def __init__(self, g=None):
+
+        self.g = g
+        self.classes = dict()
+
+        self.entities = dict()
+        self.values = dict()
+        self.names = dict()
+
+    def bind(self, cls):
+        """The rdfSubject class, or a subclass of it that writes to `g`."""
+
+        if self.g is None:
+            return cls
+
+        if cls not in self.classes:
+            self.classes[cls] = type(cls.__name__, (cls,), {"db": self.g})
+
+        return self.classes[cls]
+
+    def new(self, cls, *args, **properties):
+        """Make an entity that is not shared (a role, item, ...)."""
+
+        return self.bind(cls)(*args, **properties)
+
+    def get(self, cls, uri, links: dict = None, **properties):
+        """
+        Return the entity of this class with this uri.
+
+        Args:
+            cls: The rdfSubject class.
+            uri: URIRef or BNode of the entity.
+            links (dict): attribute --> values to add on every occurrence.
+            **properties: attribute --> value, the last occurrence wins.
+        """
+
+        entity = self.entities.get((cls, uri))
+
+        if entity is None:
+            entity = self.new(cls, uri, **properties, **(links or {}))
+            self.entities[(cls, uri)] = entity
+
+            for k, v in properties.items():
+                self.values[(uri, getattr(cls, k).pred)] = v
+
+            return entity
+
+        for k, v in properties.items():
+            key = (uri, getattr(cls, k).pred)
+            if key not in self.values or self.values[key] != v:
+                setattr(entity, k, v)
+                self.values[key] = v
+
+        if links:
+            for attr, values in links.items():
+                predicate = getattr(cls, attr).pred
+
+                for v in values:
+                    if isinstance(v, rdfSubject):
+                        v = v.resUri
+                    entity.db.add((uri, predicate, v))
+
+        return entity
+
+    def seen(self, cls, uri):
+
+        return (cls, uri) in self.entities
+
+    def personName(self, nameString, identifier):
+        """parsePersonName, once per name string and identifier."""
+
+        key = (nameString, identifier)
+
+        if key not in self.names:
+            self.names[key] = parsePersonName(
+                nameString, identifier=identifier, registry=self
+            )
+
+        return self.names[key]
+
+
+def hashIdentifier(identifier: str, version: int = 1):
+    """
+    Hash an identifier string to a stable id.
+
+    Args:
+        identifier (str): The string to hash.
+        version (int): 1 for uuid5 (X500 namespace), 2 for xxh3-128.
+
+    Returns:
+        str: The id.
+    """
+
+    if version == 1:
+        return str(uuid.uuid5(uuid.NAMESPACE_X500, identifier))
+    elif version == 2:
+        import xxhash
+
+        return xxhash.xxh3_128_hexdigest(identifier)
+    else:
+        raise ValueError(f"Unknown unique() hash version: {version}")
+
+
+@lru_cache(maxsize=UNIQUE_CACHESIZE)
+def uniqueTerm(identifier: str, ns=None, version: int = 1):
+    """Memoized BNode or URIRef for a non-empty identifier string."""
+
+    unique_id = hashIdentifier(identifier, version)
+
+    if ns:
+        return URIRef(ns + unique_id)
+    else:
+        return BNode(unique_id)
+
+
+def unique(*args, ns=None, version=None):
     """
     Get a unique identifier (BNode or URIRef) for an entity based on an ordered
     list of values. Specify the namespace (ns) attribute to return a URIRef.
 
+    Identifiers are memoized (see uniqueTerm), since the same values are
+    asked for several times per person and per record.
+
     Args:
         *args: Variable length argument list of values.
         ns: If given, return a URIRef on this namespace. Otherwise, return a BNode.
+        version: Hash version, defaults to UNIQUE_VERSION.
 
     Returns:
         A BNode or URIRef.
@@ -202,40 +356,49 @@ def unique(*args, ns=None):
 
     if not identifier:
         unique_id = uuid.uuid4()
-    else:
-        unique_id = uuid.uuid5(uuid.NAMESPACE_X500, identifier)
 
-    if ns:
-        return URIRef(ns + str(unique_id))
-    else:
-        return BNode(unique_id)
+        if ns:
+            return URIRef(ns + str(unique_id))
+        else:
+            return BNode(unique_id)
 
+    return uniqueTerm(identifier, ns, version or UNIQUE_VERSION)
 
-def constructSameAs(sameAs_list, sameAs_mapping: dict):
 
-    perms = permutations(sameAs_list, 2)
+def uniqueKey(*fields, ns=None, version=None):
+    """
+    Get a unique identifier for an entity based on a key of several fields.
+
+    Unlike unique(), which concatenates its values, the fields are hashed
+    as a tuple, so that ("a", "bc") and ("ab", "c") get different
+    identifiers. Used for the URIs minted from content keys (items, authors
+    and printers); unique() keeps the identifiers it has already minted.
 
-    for u1, u2 in perms:
+    Args:
+        *fields: Variable length argument list of values.
+        ns: If given, return a URIRef on this namespace. Otherwise, return a BNode.
+        version: Hash version, defaults to UNIQUE_VERSION.
 
-        sameAs_mapping[u1].add(u2)
-        sameAs_mapping[u1].update(sameAs_mapping[u2])
+    Returns:
+        A BNode or URIRef.
+    """
 
-    return sameAs_mapping
+    return unique(repr(tuple(str(i) for i in fields)), ns=ns, version=version)
 
 
-def parsePersonName(nameString, identifier=None):
+def splitPersonName(nameString):
     """
-    Parse a capitalised Notary Name from the notorial acts to pnv format.
+    Split a name string (e.g. "Wael, Burgert van der") into its pnv
+    components, one dict per name if it holds several ("A / B").
 
     Args:
-        full_name (str): Capitalised string
+        nameString (str): The name as in the records.
 
     Returns:
-        PersonName: according to pnv
+        list: dicts with the pnv PersonName properties (None if absent).
     """
 
-    pns = []
-    labels = []
+    components = []
 
     if "(" in nameString:
         nameString = re.sub(r" ?\(.*\) ?", "", nameString)
@@ -318,18 +481,46 @@ def parsePersonName(nameString, identifier=None):
         else:
             givenName, initials = None, None
 
-        pn = PersonName(
-            identifier,
-            literalName=full_name.strip() if full_name is not None else "Unknown",
-            prefix=prefix if prefix != "" else None,
-            givenName=givenName,
-            initials=initials,
-            surnamePrefix=infix if infix != "" else None,
-            baseSurname=family_name if family_name != "" else None,
-            patronym=patronym if patronym != "" else None,
-            disambiguatingDescription=suffix if suffix != "" else None,
+        components.append(
+            {
+                "literalName": full_name.strip()
+                if full_name is not None
+                else "Unknown",
+                "prefix": prefix if prefix != "" else None,
+                "givenName": givenName,
+                "initials": initials,
+                "surnamePrefix": infix if infix != "" else None,
+                "baseSurname": family_name if family_name != "" else None,
+                "patronym": patronym if patronym != "" else None,
+                "disambiguatingDescription": suffix if suffix != "" else None,
+            }
         )
 
+    return components
+
+
+def parsePersonName(nameString, identifier=None, registry: EntityRegistry = None):
+    """
+    Parse a capitalised Notary Name from the notorial acts to pnv format.
+
+    Args:
+        full_name (str): Capitalised string
+        registry (EntityRegistry): Makes the PersonName in its graph.
+
+    Returns:
+        PersonName: according to pnv
+    """
+
+    pns = []
+    labels = []
+
+    for components in splitPersonName(nameString):
+
+        if registry:
+            pn = registry.new(PersonName, identifier, **components)
+        else:
+            pn = PersonName(identifier, **components)
+
         pn.label = [pn.literalName]
 
         pns.append(pn)
@@ -338,7 +529,7 @@ def parsePersonName(nameString, identifier=None):
     return pns, labels
 
 
-def getRoleType(roleName):
+def getRoleType(roleName, registry: EntityRegistry = None):
 
     if roleName:
         uniqueString = "".join(
@@ -348,89 +539,220 @@ def getRoleType(roleName):
         uniqueString = "Unknown"
         roleName = "Unknown"
 
-    rt = SemRoleType(BNode(uniqueString), label=[roleName])
+    if registry:
+        rt = registry.get(SemRoleType, BNode(uniqueString), label=[roleName])
+    else:
+        rt = SemRoleType(BNode(uniqueString), label=[roleName])
 
     return rt
 
 
-def toRdf(filepath: str, target: str, temporalConstraint=False):
+def printerKey(name: str, impressumPlace: dict):
+    """
+    Key of a printer: its normalised name and the place of the impressum
+    (ecartico URI or name), e.g. ("barentsz hendrick", "http://...places/11").
+
+    Returns None if the place is unknown: a name alone is not enough to take
+    two printers for the same one.
+    """
 
-    g = rdfSubject.db = Graph(
-        identifier=URIRef("https://data.goldenagents.org/datasets/ggd/")
-    )
-    eventTypesDict = dict()
+    if impressumPlace:
+        place = impressumPlace["thesaurus"] or impressumPlace["name"]
+    else:
+        place = None
 
-    with open(filepath) as infile:
-        data = json.load(infile)
+    name = normaliseName(name)
+    if not name or not place:
+        return None
 
-    with open("data/authorSameAs.json") as infile:
-        authorLinkList = json.load(infile)
+    return name, place
 
-    # construct sameAsMapping from links in data
-    sameAs_mapping = defaultdict(set)
 
-    for r in data:
-        for entry in r.get("author", []) + r.get("person", []):
+def printerThesaurusURI(thesaurus: list):
+    """The URI of a printer with thesaurus links: its KB thesaurus URI if it
+    has one, otherwise minted from the sorted links."""
 
-            sameAs_list = []
+    for i in thesaurus:
+        if "data.bibliotheken.nl/id/thes/" in i:
+            return URIRef(i)
 
-            # amatch = tuple(
-            #     [r["event"]["eventid"], entry["person"]] + sorted(a["thesaurus"])
-            # )
-            pmatch = tuple([r["event"]["eventid"], entry["person"]])
-            sameAs_list.append(pmatch)
-
-            for k in (
-                "thesaurus",
-                "otr",
-                "doop",
-                "begraaf",
-                "rkd",
-                "wikidata",
-                "ecartico",
-                "na",
-            ):
-                sameAs_list += entry[k] if k in entry else []
-
-            sameAs_mapping = constructSameAs(sameAs_list, sameAs_mapping)
-
-    for k, values in sameAs_mapping.items():
-
-        for v in set(values):
-            sameAs_mapping[k].update(sameAs_mapping[v])
-
-    with open("data/sameAs_mapping.json", "w") as outfile:
-        json.dump(
-            {
-                k: [i for i in v if type(i) != tuple]
-                for k, v in sameAs_mapping.items()
-                if type(k) != tuple
-            },
-            outfile,
+    return uniqueKey(*sorted(thesaurus), ns=ggdPrinter)
+
+
+def buildPrinterIndex(records: list):
+    """
+    Printer resolution index: printerKey --> URI of the printer with that
+    name and impressum place that has thesaurus links (id2printer.json).
+
+    Printers without thesaurus links are resolved through this index, so
+    that all occurrences of a printer become one node. Keys that belong to
+    more than one thesaurus printer are left out.
+
+    Returns:
+        dict: printerKey --> URIRef
+    """
+
+    index = dict()
+
+    for r in records:
+        for p in r.get("person", []):
+            if p["role"] == "Drukker/uitgever" and p["thesaurus"]:
+                key = printerKey(p["person"], r["impressum_place"])
+                if key is None:
+                    continue
+
+                uri = printerThesaurusURI(p["thesaurus"])
+
+                if index.setdefault(key, uri) != uri:
+                    index[key] = None
+
+    return {k: v for k, v in index.items() if v is not None}
+
+
+def buildEvents(records: list, registry: EntityRegistry, eventTypes):
+    """
+    Build every sem:Event once, from all the records (poems) for that
+    occasion together: their places, event types, labels, OTR, baptism and
+    burial links and the poems themselves (subjectOf) are merged. The actors
+    are added per poem later on.
+
+    Args:
+        records (list): Parsed records.
+        registry (EntityRegistry): Registry for the shared entities.
+        eventTypes (EventTypeRegistry): The event type thesaurus.
+
+    Returns:
+        dict: eventid --> Event
+    """
+
+    grouped = dict()
+    for r in records:
+        grouped.setdefault(r["event"]["eventid"], []).append(r)
+
+    events = dict()
+
+    for eventid, group in grouped.items():
+
+        places = dict()
+        eTypes = dict()
+        labels = dict()
+        precedingEvents = dict()
+        followingEvents = dict()
+
+        for r in group:
+
+            for place in r["event"]["place"]:
+                placeName = place["name"]
+                placeURI = place["thesaurus"]
+
+                if (placeURI or placeName) in places:
+                    continue
+                elif placeURI:
+                    places[placeURI] = registry.get(
+                        Place, URIRef(placeURI), name=[placeName], label=[placeName]
+                    )
+                else:
+                    places[placeName] = registry.new(Place, None, name=[placeName])
+
+            for eType in r["event"]["type"]:
+                if eType not in eTypes:
+                    eTypes[eType] = registry.get(
+                        EventType, eventTypes.uri(eType), label=[eType]
+                    )
+                if eType:
+                    labels[Literal(f"{eType} ({r['event']['year']})", lang="nl")] = None
+
+            for i in r["event"]["otr"]:
+                precedingEvents[URIRef(i)] = None
+            for i in r["event"]["doop"] + r["event"]["begraaf"]:
+                followingEvents[URIRef(i)] = None
+
+        event = group[0]["event"]
+
+        events[eventid] = registry.get(
+            Event,
+            ggdEvent.term(str(eventid)),
+            hasTimeStamp=Literal(event["timeStamp"], datatype=XSD.date)
+            if event["timeStamp"]
+            else None,
+            hasEarliestBeginTimeStamp=Literal(
+                event["earliestBeginTimeStamp"], datatype=XSD.date
+            ),
+            hasLatestEndTimeStamp=Literal(
+                event["latestEndTimeStamp"], datatype=XSD.date
+            ),
+            hasPlace=list(places.values()),
+            eventType=list(eTypes.values()),
+            subjectOf=[ggd.term(r["id"]) for r in group],
+            label=list(labels),
+            precedingEvent=list(precedingEvents),
+            followingEvent=list(followingEvents),
         )
 
-    itemCounter = count(1)
-    authorCounter = count(1)
-    printerCounter = count(1)
-    personCounter = count(1)
+    return events
 
-    # same thesaurus entry hields same uri
-    author2uri = dict()
-    printer2uri = dict()
-    person2uri = dict()
 
-    if temporalConstraint:
-        beginConstraint, endConstraint = temporalConstraint
-    else:
-        beginConstraint, endConstraint = 0, 3000
+class Converter:
+    """
+    The context of one conversion: the graph the records are converted to,
+    the registry of shared entities, the sameAs clusters and the URI maps,
+    counters and URI migration.
+
+    All entities are made through the registry, in classes bound to this
+    graph, so the global rdfSubject.db is not used. Several conversions
+    (e.g. temporal slices) can therefore run in one process, also in
+    threads.
 
-    for r in data:
+    Args:
+        g (Graph): Graph (or BufferedGraph) for the triples.
+        sameAs (SameAsStore): The sameAs clusters.
+        eventTypes (EventTypeRegistry): The event type thesaurus.
+        authorLinks (dict): The author link file (data/authorSameAs.json).
+    """
+
+    def __init__(self, g, sameAs, eventTypes, authorLinks: dict):
+
+        self.g = g
+        self.registry = EntityRegistry(g)
+        self.sameAs = sameAs
+        self.eventTypes = eventTypes
+        self.authorLinks = authorLinks
+
+        # Item, author and printer URIs are minted from content keys. The
+        # counters reproduce the URIs of earlier (order dependent) versions, so
+        # that a mapping old --> new can be written to uriMigration (opt-in,
+        # e.g. "data/uri_migration.json" for a full, unsliced run).
+        self.itemCounter = count(1)
+        self.authorCounter = count(1)
+        self.printerCounter = count(1)
+        self.personCounter = count(1)
+        self.migration = dict()
+
+        # same thesaurus entry hields same uri
+        self.author2uri = dict()
+        self.printer2uri = dict()
+        self.person2uri = dict()
+
+    def convert(self, records: list):
+        """
+        Convert parsed records to the graph.
 
-        ### Timporal constraint
-        year = int(r["event"]["earliestBeginTimeStamp"][:4])
-        if year < beginConstraint or year >= endConstraint:
-            continue
-        ### Timporal constraint
+        Returns:
+            Graph: The graph of the converter.
+        """
+
+        # Poems for the same occasion share one event, built once
+        self.events = buildEvents(records, self.registry, self.eventTypes)
+        self.printerIndex = buildPrinterIndex(records)
+
+        for r in records:
+            self.convertRecord(r)
+
+        return self.g
+
+    def convertRecord(self, r: dict):
+
+        registry = self.registry
 
         abouts = []
         semRoles = []
@@ -453,9 +775,7 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
             #     [r["event"]["eventid"], a["person"]] + sorted(a["thesaurus"])
             # )
             amatch = tuple([r["event"]["eventid"], a["person"]])
-            authorSameAs = [
-                URIRef(i) for i in sameAs_mapping[amatch] if type(i) != tuple
-            ]
+            authorSameAs = [URIRef(i) for i in self.sameAs[amatch]]
 
             if a["thesaurus"]:
 
@@ -471,11 +791,14 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
                         authorSameAs.append(URIRef(i))
 
                 if authorURI is None:
-                    authorURI = author2uri.get(amatch)
+                    authorURI = self.author2uri.get(amatch)
 
                     if authorURI is None:
-                        authorURI = ggdAuthor.term(str(next(authorCounter)))
-                        author2uri[amatch] = authorURI
+                        authorURI = uniqueKey(*amatch, ns=ggdAuthor)
+                        self.author2uri[amatch] = authorURI
+                        self.migration[
+                            ggdAuthor.term(str(next(self.authorCounter)))
+                        ] = authorURI
 
             else:
                 # No thesaurus entry, but maybe this author is in the link file
@@ -488,23 +811,26 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
                     else:
 
                         # already defined?
-                        authorURI = author2uri.get(amatch)
+                        authorURI = self.author2uri.get(amatch)
 
                         # not defined, try to find it in the link file
                         # btw, we need a database
                         if authorURI is None:
-                            for n, link in authorLinkList.items():
+                            for n, link in self.authorLinks.items():
                                 if r["id"] in link.get(a["person"], []):
                                     authorURI = ggdAuthor.term("a" + n)
                                     break
 
                             if authorURI is None:
-                                authorURI = ggdAuthor.term(str(next(authorCounter)))
+                                authorURI = uniqueKey(*amatch, ns=ggdAuthor)
+                                self.migration[
+                                    ggdAuthor.term(str(next(self.authorCounter)))
+                                ] = authorURI
 
-                            author2uri[amatch] = authorURI
+                            self.author2uri[amatch] = authorURI
 
             # Single name to unique person
-            pn, pnLabels = parsePersonName(
+            pn, pnLabels = registry.personName(
                 a["person"], identifier=unique(str(authorURI))
             )
             labelInverseName = [a["person"]]
@@ -517,19 +843,21 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
             if authorURI in authorSameAs:
                 authorSameAs.remove(authorURI)
 
-            author = Person(
+            author = registry.get(
+                Person,
                 authorURI,
                 label=labelInverseName,
                 name=pnLabels,
                 hasName=pn,
                 gender=gender,
-                sameAs=authorSameAs,
+                links={"sameAs": authorSameAs},
             )
 
             # authorsDict[a['person']] = (author, pn, pnLabels)
 
             authors.append(
-                Role(
+                registry.new(
+                    Role,
                     None,
                     label=labelInverseName,
                     name=pnLabels,
@@ -538,7 +866,8 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
                 )
             )
 
-        book = Book(
+        book = registry.new(
+            Book,
             ggd.term(r["id"]),
             name=[r["title"]] if r["title"] else [],
             label=[r["title"]] if r["title"] else [],
@@ -562,14 +891,15 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
 
         if printPlace:
             if printPlace["thesaurus"]:
-                printPlace = Place(
+                printPlace = registry.get(
+                    Place,
                     URIRef(printPlace["thesaurus"]),
                     name=[printPlace["name"]],
                     label=[printPlace["name"]],
                 )
             else:
-                printPlace = Place(
-                    None, name=[printPlace["name"]], label=[printPlace["name"]]
+                printPlace = registry.new(
+                    Place, None, name=[printPlace["name"]], label=[printPlace["name"]]
                 )
 
         if printYear:
@@ -581,7 +911,8 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
         else:
             earliestBeginTimeStampPrint, latestEndTimeStampPrint = None, None
 
-        pubEvent = PublicationEvent(
+        pubEvent = registry.new(
+            PublicationEvent,
             None,
             label=[f"{impressum or ''} ({printYear or '?'})"],
             description=impressum,
@@ -592,61 +923,22 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
         )
         book.publication = pubEvent
 
-        eTypes = []
-        for eType in r["event"]["type"]:
-            eventType = eventTypesDict.get(eType)
-            if eventType is None:
-                eventTypesDict[eType] = EventType(
-                    gaThes.term(eType.lower().replace(" ", "").replace(",", "en")),
-                    label=[eType],
-                )
-                eventType = eventTypesDict.get(eType)
-            eTypes.append(eventType)
-
-        places = []
-        for place in r["event"]["place"]:
-            placeName = place["name"]
-
-            placeURI = place["thesaurus"]
-            if placeURI:
-                placeURI = URIRef(placeURI)
-
-            places.append(Place(placeURI, name=[placeName]))
-
-        event = Event(
-            ggdEvent.term(str(r["event"]["eventid"])),
-            hasTimeStamp=Literal(r["event"]["timeStamp"], datatype=XSD.date)
-            if r["event"]["timeStamp"]
-            else None,
-            hasEarliestBeginTimeStamp=Literal(
-                r["event"]["earliestBeginTimeStamp"], datatype=XSD.date
-            ),
-            hasLatestEndTimeStamp=Literal(
-                r["event"]["latestEndTimeStamp"], datatype=XSD.date
-            ),
-            hasPlace=places,
-            eventType=eTypes,
-            subjectOf=[book],
-            label=[
-                Literal(f"{i} ({r['event']['year']})", lang="nl")
-                for i in r["event"]["type"]
-                if i
-            ],
-            precedingEvent=[URIRef(i) for i in r["event"]["otr"]],
-            followingEvent=[
-                URIRef(i) for i in r["event"]["doop"] + r["event"]["begraaf"]
-            ],
-        )
+        event = self.events[r["event"]["eventid"]]
         abouts.append(event)
 
         identifiers = [
-            PropertyValue(
-                None, name=["GGD id"], value=r["id"], label=[f"{r['id']} (GGD id)"]
+            registry.new(
+                PropertyValue,
+                None,
+                name=["GGD id"],
+                value=r["id"],
+                label=[f"{r['id']} (GGD id)"],
             )
         ]
         if r.get("steurid"):
             identifiers.append(
-                PropertyValue(
+                registry.new(
+                    PropertyValue,
                     None,
                     name=["Van der Steur id"],
                     label=[f"{r['steurid']} (Van der Steur id)"],
@@ -658,7 +950,8 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
         for m in r["melody"]:
 
             # The melody is arranged for this particular occasion
-            arrangement = MusicComposition(
+            arrangement = registry.new(
+                MusicComposition,
                 unique(m, r["id"]),
                 name=[Literal(f"{r['title']} (Melodie: {m['label']})", lang="nl")],
                 label=[Literal(f"{r['title']} (Melodie: {m['label']})", lang="nl")],
@@ -666,12 +959,13 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
             )
 
             # melody (MusicComposition) --> arrangement (MusicComposition) --> lyrics (Book)
-            melody = MusicComposition(
+            melody = registry.get(
+                MusicComposition,
                 unique(m["label"]),
                 name=[m["label"]],
                 label=[m["label"]],
                 url=URIRef(m["liederenbank"]) if m["liederenbank"] else None,
-                musicArrangement=[arrangement],
+                links={"musicArrangement": [arrangement]},
             )
 
         # persons
@@ -694,29 +988,47 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
                             printerSameAs.append(URIRef(i))
 
                     if printerURI is None:
-                        printerURI = printer2uri.get(tuple(sorted(p["thesaurus"])))
+                        printerURI = self.printer2uri.get(tuple(sorted(p["thesaurus"])))
 
                         if printerURI is None:
-                            printerURI = ggdPrinter.term(str(next(printerCounter)))
-                            printer2uri[tuple(sorted(p["thesaurus"]))] = printerURI
+                            printerURI = uniqueKey(
+                                *sorted(p["thesaurus"]), ns=ggdPrinter
+                            )
+                            self.printer2uri[tuple(sorted(p["thesaurus"]))] = printerURI
+                            self.migration[
+                                ggdPrinter.term(str(next(self.printerCounter)))
+                            ] = printerURI
 
                 else:
                     printerSameAs = []
 
-                    printerURI = ggdPrinter.term(str(next(printerCounter)))
+                    # same name and impressum place, same printer; without a
+                    # known place, a printer of this record only
+                    key = printerKey(p["person"], r["impressum_place"])
+                    if key is None:
+                        printerURI = uniqueKey(r["id"], p["person"], ns=ggdPrinter)
+                    else:
+                        printerURI = self.printerIndex.get(key) or uniqueKey(
+                            *key, ns=ggdPrinter
+                        )
+
+                    self.migration[
+                        ggdPrinter.term(str(next(self.printerCounter)))
+                    ] = printerURI
 
                 # Single name to unique person
-                pn, pnLabels = parsePersonName(
+                pn, pnLabels = registry.personName(
                     p["person"], identifier=unique(str(printerURI))
                 )
                 labelInverseName = [p["person"]]
 
-                printer = Organization(
+                printer = registry.get(
+                    Organization,
                     printerURI,
                     label=labelInverseName,
                     name=pnLabels,
                     hasName=pn,
-                    sameAs=printerSameAs,
+                    links={"sameAs": printerSameAs},
                 )
 
                 # printers.append(
@@ -733,9 +1045,7 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
                 personURI = None
                 pmatch = tuple([r["event"]["eventid"], p["person"]])
 
-                personSameAs = [
-                    URIRef(i) for i in sameAs_mapping[pmatch] if type(i) != tuple
-                ]
+                personSameAs = [URIRef(i) for i in self.sameAs[pmatch]]
 
                 if p["thesaurus"]:
 
@@ -749,12 +1059,12 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
 
                     # This is never reached?
                     if personURI is None:
-                        personURI = person2uri.get(pmatch)
+                        personURI = self.person2uri.get(pmatch)
 
                         # if personURI is None:
                         #     personURI = ggdPerson.term(str(
-                        #         next(personCounter)))
-                        #     person2uri[pmatch] = personURI
+                        #         next(self.personCounter)))
+                        #     self.person2uri[pmatch] = personURI
 
                 if personURI is None:
                     # else:
@@ -763,10 +1073,10 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
                         personURI = URIRef(p["wikidata"][0])
                     else:
                         personURI = unique(*sorted(personSameAs), ns=ggdPerson)
-                        person2uri[pmatch] = personURI
+                        self.person2uri[pmatch] = personURI
 
                 # Single name to unique person
-                pn, pnLabels = parsePersonName(
+                pn, pnLabels = registry.personName(
                     p["person"], identifier=unique(str(personURI))
                 )
                 labelInverseName = [p["person"]]
@@ -779,16 +1089,18 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
                 if personURI in personSameAs:
                     personSameAs.remove(personURI)
 
-                person = Person(
+                person = registry.get(
+                    Person,
                     personURI,
                     label=labelInverseName,
                     hasName=pn,
                     name=pnLabels,
                     gender=gender,
-                    sameAs=personSameAs,
+                    links={"sameAs": personSameAs},
                 )
 
-                role = Role(
+                role = registry.new(
+                    Role,
                     unique(p["person"] + r["id"] + "semrole"),
                     about=person,
                     roleName=p["role"],
@@ -800,19 +1112,20 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
 
                 # Attach them to the event
                 semRoles.append(
-                    SemRole(
+                    registry.new(
+                        SemRole,
                         unique(p["person"] + r["event"]["eventid"] + "semrole"),
                         value=person,
                         name=pnLabels,
                         label=pnLabels,
-                        roleType=getRoleType(p["role"]),
+                        roleType=getRoleType(p["role"], registry),
                     )
                 )
 
         book.about = abouts
         pubEvent.publishedBy = printers
 
-        event.hasActor = semRoles
+        registry.get(Event, event.resUri, links={"hasActor": semRoles})
 
         for item in r["item"]:
 
@@ -821,8 +1134,12 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
 
             label = [f"{holdingArchive} {itemLocation}"]
 
-            workExample = Item(
-                ggdItem.term(str(next(itemCounter))),
+            itemURI = uniqueKey(r["id"], holdingArchive, itemLocation, ns=ggdItem)
+            self.migration[ggdItem.term(str(next(self.itemCounter)))] = itemURI
+
+            workExample = registry.new(
+                Item,
+                itemURI,
                 name=label,
                 label=label,
                 holdingArchive=holdingArchive,
@@ -833,7 +1150,8 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
             workExamples.append(workExample)
         book.workExample = workExamples
 
-        document = Document(
+        document = registry.new(
+            Document,
             None,
             description=r.get("description"),
             comment=r.get("comments"),
@@ -851,9 +1169,81 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
         if r["stcn"]:
             book.sameAs = [URIRef(r["stcn"])]
 
+
+def toRdf(
+    filepath: str,
+    target,
+    temporalConstraint=False,
+    store: str = None,
+    storePath: str = STOREPATH,
+    batchSize: int = None,
+    uriMigration: str = None,
+    sameAsStore: str = None,
+    sameAsMapping: str = "data/sameAs_mapping.json",
+    statistics: str = None,
+    partitionBy: str = None,
+    partitionSize: int = PARTITIONSIZE,
+    partitionRange: int = None,
+    partitionFormat: str = "nquads",
+    level: int = None,
+):
+
+    # Batched adds (addN per chunk, see benchmarks/batching.py) or, by
+    # default, one store update per triple
+    if batchSize:
+        g = BufferedGraph(
+            identifier=URIRef("https://data.goldenagents.org/datasets/ggd/"),
+            batchSize=batchSize,
+        )
+    else:
+        g = Graph(identifier=URIRef("https://data.goldenagents.org/datasets/ggd/"))
+
+    data = loadJSON(filepath)
+
+    # sameAs clusters from the links in data, only changed groups are redone
+    # when they are kept in a file (by default they are built in memory)
+    sameAs_mapping = SameAsStore(sameAsStore or ":memory:")
+    sameAs_mapping.update(sameAsGroups(data))
+
+    converter = Converter(
+        g,
+        sameAs=sameAs_mapping,
+        eventTypes=getEventTypes(),
+        authorLinks=loadJSON("data/authorSameAs.json"),
+    )
+
+    if temporalConstraint:
+        beginConstraint, endConstraint = temporalConstraint
+    else:
+        beginConstraint, endConstraint = 0, 3000
+
+    ### Timporal constraint
+    records = [
+        r
+        for r in data
+        if beginConstraint
+        <= int(r["event"]["earliestBeginTimeStamp"][:4])
+        < endConstraint
+    ]
+    ### Timporal constraint
+
+    converter.convert(records)
+
+    if sameAsMapping:
+        sameAs_mapping.toJSON(sameAsMapping)
+    sameAs_mapping.close()
+
+    if uriMigration:
+        with openFile(uriMigration, "w", level=level) as outfile:
+            json.dump(
+                {str(k): str(v) for k, v in converter.migration.items()},
+                outfile,
+                indent=4,
+            )
+
     # Skolemize BNodes
     g = g.skolemize(
-        new_graph=Graph(identifier=g.identifier),
+        new_graph=Graph(identifier=g.identifier, bind_namespaces="core"),
         authority="https://data.goldenagents.org/",
         basepath=skolem_genid,
     )
@@ -866,8 +1256,64 @@ def toRdf(filepath: str, target: str, temporalConstraint=False):
     g.bind("bio", bio)
     g.bind("pnv", pnv)
 
-    print(f"Serializing to {target}")
-    g.serialize(target, format="trig")
+    # one or more targets: rdf/ggd.trig, or e.g. [rdf/ggd.trig, rdf/ggd.jsonld]
+    targets = [target] if isinstance(target, str) else list(target or [])
+
+    if targets and partitionBy:
+        # rdf/ggd.trig --> rdf/ggd/ggd-<key>-0001.nq.gz ... + manifest.json
+        # (.zst partitions for a .zst target)
+        destination = os.path.splitext(stripCompression(targets[0]))[0]
+        extension = (
+            os.path.splitext(targets[0])[1] if compression(targets[0]) else ".gz"
+        )
+        print(f"Writing partitions by {partitionBy} to {destination}")
+
+        if partitionBy == "triples":
+            roots = None
+        elif partitionBy == "id":
+            width = partitionRange or 1000
+            roots = {
+                ggd.term(r["id"]): f"id{int(r['id']) // width * width}" for r in data
+            }
+        elif partitionBy == "year":
+            width = partitionRange or 10
+            roots = {
+                ggd.term(r["id"]): str(
+                    int(r["event"]["earliestBeginTimeStamp"][:4]) // width * width
+                )
+                for r in data
+            }
+        else:
+            raise ValueError(
+                f"Unknown partitioning {partitionBy!r}, choose from: triples, id, year"
+            )
+
+        writePartitions(
+            g,
+            destination,
+            roots=roots,
+            size=partitionSize,
+            format=partitionFormat,
+            compression=extension,
+            level=level,
+        )
+
+    elif targets:
+        # all formats in one pass over the graph, JSON-LD framed per Book
+        print(f"Serializing to {', '.join(targets)}")
+        writeTargets(
+            g, targets, roots=[ggd.term(r["id"]) for r in records], level=level
+        )
+
+    if statistics:
+        print(f"Writing statistics to {statistics}")
+        writeStatistics(g, statistics).report()
+
+    if store:
+        print(f"Loading into {store} store at {storePath}")
+        loadGraph(g, path=storePath, store=store)
+
+    return g
 
 
 def main():
@@ -879,7 +1325,80 @@ def main():
     #           target=f'rdf/ggd_{temp[0]}-{temp[1]}.ttl',
     #           temporalConstraint=temp)
 
-    toRdf(filepath=JSONFILE, target=f"rdf/ggd.trig")
+    parser = argparse.ArgumentParser(description="Convert data/ggd.json to RDF.")
+    parser.add_argument("--json", default=JSONFILE, help="parsed records")
+    parser.add_argument(
+        "--target", nargs="*", default=["rdf/ggd.trig"], help="output files"
+    )
+    parser.add_argument(
+        "--store",
+        choices=list(STORES),
+        help="also load the graph into this on-disk store",
+    )
+    parser.add_argument("--store-path", default=STOREPATH, help="store directory")
+    parser.add_argument(
+        "--level",
+        type=int,
+        help="compression level for .gz or .zst targets (default: gzip 6, zstd 3)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        help="add triples in batches of this size (BufferedGraph), "
+        "default one store update per triple",
+    )
+    parser.add_argument(
+        "--partition-by",
+        choices=["triples", "id", "year"],
+        help="write compressed partitions plus a manifest.json to a directory "
+        "named after the first target instead of the targets",
+    )
+    parser.add_argument(
+        "--partition-size",
+        type=int,
+        default=PARTITIONSIZE,
+        help=f"maximum number of triples per partition (default: {PARTITIONSIZE})",
+    )
+    parser.add_argument(
+        "--partition-range",
+        type=int,
+        help="width of an id or year partition (default: 1000 ids, 10 years)",
+    )
+    parser.add_argument(
+        "--partition-format",
+        choices=["nquads", "trig"],
+        default="nquads",
+        help="format of the partitions (default: nquads)",
+    )
+    parser.add_argument(
+        "--uri-migration",
+        help="old --> new URI map, by default next to the first target "
+        '(rdf/ggd.uri_migration.json), "" to skip',
+    )
+    args = parser.parse_args()
+
+    uriMigration = args.uri_migration
+    if uriMigration is None and args.target:
+        uriMigration = (
+            os.path.splitext(stripCompression(args.target[0]))[0]
+            + ".uri_migration.json"
+        )
+
+    toRdf(
+        filepath=args.json,
+        target=args.target,
+        sameAsStore=SAMEASPATH,
+        statistics=statisticsPath(args.target[0]) if args.target else None,
+        store=args.store,
+        storePath=args.store_path,
+        uriMigration=uriMigration or None,
+        batchSize=args.batch_size,
+        level=args.level,
+        partitionBy=args.partition_by,
+        partitionSize=args.partition_size,
+        partitionRange=args.partition_range,
+        partitionFormat=args.partition_format,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,183 @@
+import os
+import json
+
+from rdflib import Graph, Namespace, URIRef
+
+from utils import nquad, openFile, COMPRESSION
+
+schema = Namespace("https://schema.org/")
+
+PARTITIONSIZE = 1_000_000
+
+# Links from a shared entity back to the records, not followed by `ownership`
+INVERSE = {schema.subjectOf}
+
+EXTENSIONS = {
+    "nquads": ".nq",
+    "trig": ".trig",
+}
+
+
+def ownership(g, roots: dict):
+    """
+    Assign every subject of a graph to a partition key.
+
+    Starting from the root of each record (its Book), everything it refers
+    to that is a subject in the graph is given the key of that record, so
+    that a record and its items, roles, names and events end up together.
+    The traversal stops at other roots and does not follow the inverse links
+    in INVERSE (an Event lists all the Books of its occasion). Entities that
+    are reached from roots with different keys (a person, place or event of
+    several records) are shared and left out.
+
+    Args:
+        g (Graph): The converted graph.
+        roots (dict): root URI --> partition key, in record order.
+
+    Returns:
+        dict: subject --> partition key. Shared and unreached subjects are
+            left out.
+    """
+
+    owner = dict()
+
+    for root, key in roots.items():
+        seen = {root}
+        stack = [root]
+        while stack:
+            s = stack.pop()
+            if owner.setdefault(s, key) != key:
+                owner[s] = None  # shared
+
+            for p, o in g.predicate_objects(s):
+                if (
+                    isinstance(o, URIRef)
+                    and o not in seen
+                    and o not in roots
+                    and p not in INVERSE
+                    and (o, None, None) in g
+                ):
+                    seen.add(o)
+                    stack.append(o)
+
+    return {s: key for s, key in owner.items() if key is not None}
+
+
+def writePartition(triples, filepath: str, g, format: str, level: int = None):
+    """Write triples of `g` as a compressed file in the named graph of `g`."""
+
+    with openFile(filepath, "w", level=level) as outfile:
+
+        if format == "nquads":
+            for triple in triples:
+                outfile.write(nquad(triple, g.identifier))
+        else:
+            partition = Graph(identifier=g.identifier)
+            for prefix, namespace in g.namespaces():
+                partition.bind(prefix, namespace)
+            for triple in triples:
+                partition.add(triple)
+            outfile.write(partition.serialize(format="trig"))
+
+
+def writePartitions(
+    g,
+    destination: str,
+    roots: dict = None,
+    size: int = PARTITIONSIZE,
+    format: str = "nquads",
+    compression: str = ".gz",
+    level: int = None,
+):
+    """
+    Write a graph as compressed N-Quads or TriG files of at most `size`
+    triples each, plus a manifest.json, so that the files can be produced
+    and bulk loaded independently. Partitions of an earlier run that are
+    listed in the old manifest and not written again are removed.
+
+    All triples of a subject go in the same file (a file can therefore be a
+    little larger than `size` for a subject with many triples). With
+    `roots`, subjects are first split by the partition key of the record
+    they belong to, e.g. a year or record id range.
+
+    Args:
+        g (Graph): The converted graph. Its identifier is the graph name.
+        destination (str): Directory for the partitions.
+        roots (dict): root URI --> partition key, see `ownership`.
+        size (int): Maximum number of triples per file.
+        format (str): "nquads" or "trig".
+        compression (str): ".gz" or ".zst" (needs `zstandard`).
+        level (int): Compression level, see `openFile`.
+
+    Returns:
+        list: The manifest entries.
+    """
+
+    if format not in EXTENSIONS:
+        raise ValueError(
+            f"Unknown format {format!r}, choose from: {', '.join(EXTENSIONS)}"
+        )
+    if compression not in COMPRESSION:
+        raise ValueError(
+            f"Unknown compression {compression!r}, choose from: {', '.join(COMPRESSION)}"
+        )
+
+    os.makedirs(destination, exist_ok=True)
+
+    manifestPath = os.path.join(destination, "manifest.json")
+    if os.path.exists(manifestPath):
+        with open(manifestPath) as infile:
+            previous = [os.path.basename(entry["file"]) for entry in json.load(infile)]
+    else:
+        previous = []
+
+    owner = ownership(g, roots) if roots else dict()
+
+    partitions = dict()
+    for s in g.subjects(unique=True):
+        partitions.setdefault(owner.get(s, "shared" if roots else "all"), []).append(s)
+
+    name = os.path.basename(os.path.normpath(destination))
+    manifest = []
+
+    for key, subjects in partitions.items():
+        n = 0
+        triples = []
+
+        for i, s in enumerate(subjects, 1):
+            triples += g.triples((s, None, None))
+
+            if len(triples) >= size or i == len(subjects):
+                n += 1
+                filename = f"{name}-{key}-{n:04}{EXTENSIONS[format]}{compression}"
+                writePartition(
+                    triples,
+                    os.path.join(destination, filename),
+                    g,
+                    format,
+                    level=level,
+                )
+
+                manifest.append(
+                    {
+                        "file": filename,
+                        "key": key,
+                        "graph": str(g.identifier),
+                        "format": format,
+                        "compression": COMPRESSION[compression],
+                        "triples": len(triples),
+                    }
+                )
+                triples = []
+
+    with open(manifestPath, "w") as outfile:
+        json.dump(manifest, outfile, indent=4)
+
+    # stale partitions, e.g. of a larger graph or another size or format
+    written = {entry["file"] for entry in manifest}
+    for filename in previous:
+        path = os.path.join(destination, filename)
+        if filename not in written and os.path.exists(path):
+            os.remove(path)
+
+    return manifest
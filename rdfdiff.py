@@ -0,0 +1,309 @@
+"""
+Compare two conversion outputs as graphs: canonical N-Quads lines, sorted
+with bounded memory, with differences reported per subject.
+
+Usage (from the repository root):
+    python rdfdiff.py rdf/before.nq.gz rdf/after.nq.gz --limit 20 --report data/diff.json
+
+Blank nodes, skolem IRIs and URIs that differ from run to run (counter
+minted or random uuid4 URIs) are relabelled by a hash of their own triples,
+so that two conversions of the same data compare equal. Nodes with the same
+content get the same label; a reference from one such node to another is
+replaced by a placeholder.
+
+Inputs are N-Quads or N-Triples files (streamed), partition directories
+with a manifest.json (see partition.py), or other RDF files, which are
+parsed in memory by rdflib. All can be compressed (.gz or .zst).
+"""
+
+import os
+import re
+import sys
+import json
+import heapq
+import hashlib
+import argparse
+import tempfile
+from itertools import groupby
+
+from rdflib import Dataset
+from rdflib.util import guess_format
+from rdflib.graph import DATASET_DEFAULT_GRAPH_ID
+
+from utils import openFile, stripCompression, nquad
+
+CHUNKSIZE = 1_000_000  # lines per sorted run
+
+# N-Quads terms: IRI, blank node or literal
+TERM = re.compile(r'<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9\-]+|\^\^<[^>]*>)?')
+
+# Terms that differ from run to run
+UNSTABLE = re.compile(
+    r"_:"  # blank nodes
+    r"|<[^>]*/\.well-known/genid/"  # skolemized blank nodes
+    r"|<https://data\.goldenagents\.org/datasets/ggd/"
+    r"(?:item|author|printer|person)/\d+>"  # counter minted (uri_migration.json)
+    r"|<[^>]*[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}>"  # uuid4
+)
+
+PLACEHOLDER = "_:x"
+
+SEP = "\x1f"  # field separator in the sorted lines
+
+
+class ExternalSort:
+    """
+    Sort lines with bounded memory: runs of `chunkSize` sorted lines are
+    written to temporary files and merged when iterated (once).
+
+    Args:
+        directory (str): Directory for the runs.
+        chunkSize (int): Number of lines kept in memory.
+    """
+
+    def __init__(self, directory: str = None, chunkSize: int = CHUNKSIZE):
+
+        self.directory = directory
+        self.chunkSize = chunkSize
+        self.chunk = []
+        self.runs = []
+
+    def add(self, line: str):
+
+        self.chunk.append(line)
+        if len(self.chunk) >= self.chunkSize:
+            self.flush()
+
+    def flush(self):
+
+        self.chunk.sort()
+
+        fd, path = tempfile.mkstemp(suffix=".run", dir=self.directory)
+        with open(fd, "w", encoding="utf-8", newline="\n") as outfile:
+            outfile.writelines(line + "\n" for line in self.chunk)
+
+        self.runs.append(path)
+        self.chunk = []
+
+    def __iter__(self):
+
+        if not self.runs:
+            self.chunk.sort()
+            yield from self.chunk
+            return
+
+        if self.chunk:
+            self.flush()
+
+        files = [open(path, encoding="utf-8", newline="\n") for path in self.runs]
+        try:
+            yield from heapq.merge(*[(line[:-1] for line in f) for f in files])
+        finally:
+            for f in files:
+                f.close()
+            for path in self.runs:
+                os.remove(path)
+
+
+def iterQuads(path: str):
+    """
+    Yield the quads of an output as (s, p, o, g) N-Quads terms, g is "" in
+    the default graph.
+    """
+
+    if os.path.isdir(path):
+        with open(os.path.join(path, "manifest.json")) as infile:
+            manifest = json.load(infile)
+        for entry in manifest:
+            yield from iterQuads(os.path.join(path, entry["file"]))
+
+    elif stripCompression(path).endswith((".nq", ".nt")):
+        with openFile(path) as infile:
+            for line in infile:
+                terms = TERM.findall(line)
+                if len(terms) == 3:
+                    yield (*terms, "")
+                elif terms:
+                    yield tuple(terms[:4])
+
+    else:
+        ds = Dataset()
+        with openFile(path, "rb") as infile:
+            ds.parse(infile, format=guess_format(stripCompression(path)))
+
+        for s, p, o, c in ds.quads():
+            if c == DATASET_DEFAULT_GRAPH_ID:
+                c = None
+            terms = TERM.findall(nquad((s, p, o), c))
+            yield tuple(terms) if len(terms) == 4 else (*terms, "")
+
+
+def quadLine(s: str, p: str, o: str, g: str):
+
+    return " ".join(t for t in (s, p, o, g) if t) + " ."
+
+
+def canonicalLines(quads, directory: str = None, chunkSize: int = CHUNKSIZE):
+    """
+    The canonical, sorted N-Quads lines of a stream of quads.
+
+    Args:
+        quads: (s, p, o, g) N-Quads terms, see `iterQuads`.
+        directory (str): Directory for the sorted runs.
+        chunkSize (int): Lines per sorted run.
+
+    Returns:
+        iterator: Sorted lines.
+    """
+
+    bySubject = ExternalSort(directory, chunkSize)
+    for quad in quads:
+        bySubject.add(SEP.join(quad))
+
+    labels = ExternalSort(directory, chunkSize)  # unstable term --> label
+    byObject = ExternalSort(directory, chunkSize)  # quads with an unstable object
+    canonical = ExternalSort(directory, chunkSize)
+
+    for s, group in groupby(bySubject, key=lambda line: line.split(SEP, 1)[0]):
+        rows = [line.split(SEP)[1:] for line in group]
+
+        if UNSTABLE.match(s):
+            content = sorted(
+                quadLine("", p, PLACEHOLDER if UNSTABLE.match(o) else o, g)
+                for p, o, g in rows
+            )
+            label = "_:" + hashlib.md5("\n".join(content).encode()).hexdigest()
+            labels.add(s + SEP + label)
+            s = label
+
+        for p, o, g in rows:
+            if UNSTABLE.match(o):
+                byObject.add(SEP.join((o, s, p, g)))
+            else:
+                canonical.add(quadLine(s, p, o, g))
+
+    # join the quads on their unstable object with the labels
+    labels = iter(labels)
+    current = next(labels, None)
+    for line in byObject:
+        o, s, p, g = line.split(SEP)
+
+        while current is not None and current.split(SEP, 1)[0] < o:
+            current = next(labels, None)
+
+        if current is not None and current.split(SEP, 1)[0] == o:
+            o = current.split(SEP, 1)[1]
+        else:
+            o = PLACEHOLDER  # only an object
+
+        canonical.add(quadLine(s, p, o, g))
+
+    return iter(canonical)
+
+
+def compare(a, b):
+    """
+    Walk two sorted line streams.
+
+    Yields:
+        tuple: (subject, removed lines, added lines) for every subject with
+            differences: lines only in `a` and lines only in `b`.
+    """
+
+    def bySubject(lines):
+        return groupby(lines, key=lambda line: line.split(" ", 1)[0])
+
+    a, b = bySubject(a), bySubject(b)
+    nextA, nextB = next(a, None), next(b, None)
+
+    while nextA is not None or nextB is not None:
+        if nextB is None or (nextA is not None and nextA[0] < nextB[0]):
+            yield nextA[0], list(nextA[1]), []
+            nextA = next(a, None)
+
+        elif nextA is None or nextB[0] < nextA[0]:
+            yield nextB[0], [], list(nextB[1])
+            nextB = next(b, None)
+
+        else:
+            linesA, linesB = list(nextA[1]), list(nextB[1])
+            if linesA != linesB:
+                removed, added = [], []
+                i = j = 0
+                while i < len(linesA) or j < len(linesB):
+                    if j == len(linesB) or (i < len(linesA) and linesA[i] < linesB[j]):
+                        removed.append(linesA[i])
+                        i += 1
+                    elif i == len(linesA) or linesB[j] < linesA[i]:
+                        added.append(linesB[j])
+                        j += 1
+                    else:
+                        i += 1
+                        j += 1
+                yield nextA[0], removed, added
+
+            nextA, nextB = next(a, None), next(b, None)
+
+
+def diff(a: str, b: str, directory: str = None, chunkSize: int = CHUNKSIZE):
+    """
+    Compare two outputs.
+
+    Args:
+        a (str): Path to the first output.
+        b (str): Path to the second output.
+        directory (str): Directory for the sorted runs.
+        chunkSize (int): Lines per sorted run.
+
+    Yields:
+        tuple: (subject, removed lines, added lines), see `compare`.
+    """
+
+    yield from compare(
+        canonicalLines(iterQuads(a), directory, chunkSize),
+        canonicalLines(iterQuads(b), directory, chunkSize),
+    )
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("a", help="first output (before)")
+    parser.add_argument("b", help="second output (after)")
+    parser.add_argument(
+        "--limit", type=int, default=20, help="number of subjects to print"
+    )
+    parser.add_argument("--report", help="write all differences to this JSON file")
+    parser.add_argument("--chunk", type=int, default=CHUNKSIZE)
+    parser.add_argument("--tmp", help="directory for the sorted runs")
+    args = parser.parse_args()
+
+    subjects = removed = added = 0
+    report = dict()
+
+    for subject, linesRemoved, linesAdded in diff(args.a, args.b, args.tmp, args.chunk):
+        if subjects < args.limit:
+            print(subject)
+            for line in linesRemoved:
+                print(f"  - {line}")
+            for line in linesAdded:
+                print(f"  + {line}")
+
+        if args.report:
+            report[subject] = {"removed": linesRemoved, "added": linesAdded}
+
+        subjects += 1
+        removed += len(linesRemoved)
+        added += len(linesAdded)
+
+    if args.report:
+        with openFile(args.report, "w") as outfile:
+            json.dump(report, outfile, indent=4, ensure_ascii=False)
+
+    print(f"{subjects} subjects differ: {removed} quads removed, {added} added")
+
+    sys.exit(1 if subjects else 0)
+
+
+if __name__ == "__main__":
+    main()
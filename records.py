@@ -0,0 +1,228 @@
+import os
+import pickle
+from bisect import bisect_left
+
+from utils import loadJSON
+
+JSONFILE = "data/ggd.json"
+INDEXPATH = "data/ggd.index.pickle"
+
+# Bump when the layout of the indexes changes, so that old files are rebuilt
+INDEX_VERSION = 3
+
+
+def recordKeys(r: dict):
+    """
+    Yield (index, key) for every key a parsed record is found under.
+    Unknown (None) values are not keys.
+    """
+
+    yield "id", r["id"]
+    yield "event", r["event"]["eventid"]
+
+    for p in r.get("author", []) + r.get("person", []):
+        yield "person", p["person"]
+        for uri in p["thesaurus"]:
+            yield "thesaurus", uri
+
+    place, year = r.get("impressum_place"), r.get("impressum_year")
+    if place:
+        for name in (place["name"], place["thesaurus"]):
+            if name is None:
+                continue
+            yield "printplace", name
+            if year is not None:
+                yield "impressum", (name, year)
+
+    for melody in r.get("melody", []):
+        yield "melody", melody["label"]
+
+    for item in r.get("item", []):
+        yield "archive", item["holdingArchive"]
+
+
+class RecordIndex:
+    """
+    Parsed records (the output of `ggd2json.parseRecord`) with hash indexes
+    on record id, event id, person name, thesaurus URI, impressum place and
+    year, melody and holding archive, and a sorted index on the event year.
+
+    Every index maps a key to a tuple of record positions, so a query is one
+    dict lookup instead of a scan over all records. Use `fromFile` to reuse
+    the indexes from an earlier run.
+
+    Args:
+        records (list): Parsed records.
+    """
+
+    def __init__(self, records: list):
+
+        self.records = records
+
+        indexes = dict()
+        for n, r in enumerate(records):
+            for index, key in recordKeys(r):
+                if key is None:
+                    continue
+                positions = indexes.setdefault(index, dict()).setdefault(key, [])
+                if not positions or positions[-1] != n:
+                    positions.append(n)
+
+        self.indexes = {
+            index: {key: tuple(positions) for key, positions in keys.items()}
+            for index, keys in indexes.items()
+        }
+
+        years = sorted(
+            (int(r["event"]["earliestBeginTimeStamp"][:4]), n)
+            for n, r in enumerate(records)
+        )
+        self.years = [year for year, _ in years]
+        self.yearPositions = [n for _, n in years]
+
+    @classmethod
+    def fromFile(cls, filepath: str = JSONFILE, indexPath: str = INDEXPATH):
+        """
+        Load the records with their indexes from `indexPath`, or build and
+        save them if that file is missing or older than `filepath`.
+        """
+
+        if (
+            indexPath
+            and os.path.exists(indexPath)
+            and os.path.getmtime(indexPath) >= os.path.getmtime(filepath)
+        ):
+            with open(indexPath, "rb") as infile:
+                version, index = pickle.load(infile)
+
+            if version == INDEX_VERSION:
+                return index
+
+        index = cls(loadJSON(filepath))
+
+        if indexPath:
+            index.save(indexPath)
+
+        return index
+
+    def save(self, indexPath: str = INDEXPATH):
+
+        with open(indexPath, "wb") as outfile:
+            pickle.dump((INDEX_VERSION, self), outfile, pickle.HIGHEST_PROTOCOL)
+
+    def _get(self, index: str, key):
+
+        return self.indexes.get(index, {}).get(key, ())
+
+    def _records(self, positions):
+
+        return [self.records[n] for n in sorted(positions)]
+
+    def get(self, recordID: str):
+        """The record with this id (REC), or None."""
+
+        positions = self._get("id", recordID)
+
+        return self.records[positions[0]] if positions else None
+
+    def byEvent(self, eventid: str):
+        """All poems for an event id, e.g. "1620-05-12"."""
+
+        return self._records(self._get("event", eventid))
+
+    def byPerson(self, name: str):
+        """All poems with an author or person of this name."""
+
+        return self._records(self._get("person", name))
+
+    def byThesaurus(self, uri: str):
+        """All poems with an author or person with this thesaurus URI."""
+
+        return self._records(self._get("thesaurus", uri))
+
+    def printedIn(self, place: str, year: int = None):
+        """
+        All records printed in a place (name or thesaurus URI), optionally
+        in a given year.
+        """
+
+        if year is None:
+            return self._records(self._get("printplace", place))
+        else:
+            return self._records(self._get("impressum", (place, year)))
+
+    def byMelody(self, label: str):
+        """All poems sung on a melody."""
+
+        return self._records(self._get("melody", label))
+
+    def byArchive(self, archive: str):
+        """All records with an item in a holding archive."""
+
+        return self._records(self._get("archive", archive))
+
+    def between(self, begin: int, end: int):
+        """All records with an event year in [begin, end)."""
+
+        return self._records(
+            self.yearPositions[
+                bisect_left(self.years, begin) : bisect_left(self.years, end)
+            ]
+        )
+
+    def find(
+        self,
+        eventid: str = None,
+        person: str = None,
+        thesaurus: str = None,
+        printplace: str = None,
+        printyear: int = None,
+        melody: str = None,
+        archive: str = None,
+        begin: int = None,
+        end: int = None,
+    ):
+        """
+        All records that match every given criterion, e.g.
+        `find(thesaurus=uri, begin=1650, end=1660)`.
+        """
+
+        selections = []
+
+        for index, key in [
+            ("event", eventid),
+            ("person", person),
+            ("thesaurus", thesaurus),
+            ("melody", melody),
+            ("archive", archive),
+        ]:
+            if key is not None:
+                selections.append(self._get(index, key))
+
+        if printplace is not None:
+            if printyear is None:
+                selections.append(self._get("printplace", printplace))
+            else:
+                selections.append(self._get("impressum", (printplace, printyear)))
+
+        if begin is not None or end is not None:
+            selections.append(
+                self.yearPositions[
+                    bisect_left(self.years, begin if begin is not None else 0) : (
+                        bisect_left(self.years, end)
+                        if end is not None
+                        else len(self.years)
+                    )
+                ]
+            )
+
+        if not selections:
+            return list(self.records)
+
+        # intersect, smallest selection first
+        selections.sort(key=len)
+        positions = set(selections[0])
+        for selection in selections[1:]:
+            positions.intersection_update(selection)
+
+        return self._records(positions)
@@ -0,0 +1,359 @@
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+from utils import openFile
+
+SAMEASPATH = "data/sameAs.sqlite"
+
+# Identifier fields of a person entry that link it to the same person elsewhere
+LINKFIELDS = (
+    "thesaurus",
+    "otr",
+    "doop",
+    "begraaf",
+    "rkd",
+    "wikidata",
+    "ecartico",
+    "na",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS links (
+    key TEXT NOT NULL,
+    member TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS links_key ON links (key);
+CREATE INDEX IF NOT EXISTS links_member ON links (member);
+CREATE TABLE IF NOT EXISTS members (
+    member TEXT PRIMARY KEY,
+    cluster INTEGER NOT NULL,
+    uri INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS members_cluster ON members (cluster);
+"""
+
+
+def memberKey(member):
+    """(eventid, person) --> "eventid|person". URIs are kept as they are."""
+
+    if type(member) == tuple:
+        return "|".join(member)
+    else:
+        return member
+
+
+def sameAsGroups(data: list):
+    """
+    Yield the sameAs links of the persons in the parsed records.
+
+    Every author and person entry gives one group: its local key
+    (eventid, person), so that the same name in poems for the same event is
+    the same person, and all its thesaurus and enrichment URIs.
+
+    Yields:
+        tuple: (group key, list of members)
+    """
+
+    for r in data:
+        for n, entry in enumerate(r.get("author", []) + r.get("person", [])):
+
+            members = [(r["event"]["eventid"], entry["person"])]
+            for k in LINKFIELDS:
+                members += entry[k] if k in entry else []
+
+            yield f"{r['id']}/{n}", members
+
+
+class SameAsStore:
+    """
+    Identity clusters of persons in an indexed sqlite file.
+
+    A cluster is a connected component of the sameAs groups, stored as
+    member --> cluster id and cluster id --> members. The store is updated
+    incrementally: only the clusters touched by added, changed or removed
+    groups are recomputed. The database is opened on first use, and every
+    lookup is a single indexed query.
+
+    The connection can be used from any thread (e.g. the executor of the
+    lookup service); a lock serializes the queries.
+
+    Args:
+        path (str): Path to the sqlite file, ":memory:" for a store that is
+            not kept.
+    """
+
+    def __init__(self, path: str = SAMEASPATH):
+
+        self.path = path
+        self.lock = threading.Lock()
+        self._db = None
+
+    @property
+    def db(self):
+
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript(SCHEMA)
+
+        return self._db
+
+    def close(self):
+
+        with self.lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def update(self, groups):
+        """
+        Bring the clusters in line with the current groups.
+
+        Args:
+            groups: Iterable of (group key, members), e.g. from `sameAsGroups`.
+
+        Returns:
+            int: The number of added, changed or removed groups.
+        """
+
+        with self.lock:
+            return self._update(groups)
+
+    def _update(self, groups):
+
+        db = self.db
+
+        stored = dict(db.execute("SELECT key, digest FROM groups"))
+
+        new = dict()
+        for key, members in groups:
+            members = sorted({memberKey(m) for m in members})
+            digest = hashlib.md5("\n".join(members).encode()).hexdigest()
+            new[key] = (digest, members)
+
+        changed = [k for k in new if stored.get(k) != new[k][0]]
+        removed = [k for k in stored if k not in new]
+
+        if not changed and not removed:
+            return 0
+
+        with db:
+            touched = set()
+
+            for chunk in self._chunks(changed + removed):
+                touched.update(
+                    m
+                    for (m,) in db.execute(
+                        f"SELECT member FROM links WHERE key IN ({self._marks(chunk)})",
+                        chunk,
+                    )
+                )
+                db.execute(
+                    f"DELETE FROM links WHERE key IN ({self._marks(chunk)})", chunk
+                )
+                db.execute(
+                    f"DELETE FROM groups WHERE key IN ({self._marks(chunk)})", chunk
+                )
+
+            for key in changed:
+                digest, members = new[key]
+                touched.update(members)
+                db.execute("INSERT INTO groups VALUES (?, ?)", (key, digest))
+                db.executemany(
+                    "INSERT INTO links VALUES (?, ?)", ((key, m) for m in members)
+                )
+
+            # every member of a touched cluster has to be reassigned
+            for chunk in self._chunks(list(touched)):
+                clusters = [
+                    c
+                    for (c,) in db.execute(
+                        f"SELECT DISTINCT cluster FROM members WHERE member IN ({self._marks(chunk)})",
+                        chunk,
+                    )
+                ]
+                for cchunk in self._chunks(clusters):
+                    touched.update(
+                        m
+                        for (m,) in db.execute(
+                            f"SELECT member FROM members WHERE cluster IN ({self._marks(cchunk)})",
+                            cchunk,
+                        )
+                    )
+
+            touched = list(touched)
+            for chunk in self._chunks(touched):
+                db.execute(
+                    f"DELETE FROM members WHERE member IN ({self._marks(chunk)})", chunk
+                )
+
+            (cluster,) = db.execute(
+                "SELECT COALESCE(MAX(cluster), 0) FROM members"
+            ).fetchone()
+
+            for component in self._components(touched):
+                cluster += 1
+                db.executemany(
+                    "INSERT INTO members VALUES (?, ?, ?)",
+                    ((m, cluster, m.startswith("http")) for m in component),
+                )
+
+        return len(changed) + len(removed)
+
+    def _components(self, members):
+        """Connected components of the stored links that contain `members`."""
+
+        db = self.db
+        parent = dict()
+
+        def find(m):
+            while parent[m] != m:
+                parent[m] = parent[parent[m]]
+                m = parent[m]
+            return m
+
+        seenKeys = set()
+        frontier = set(members)
+        seen = set(frontier)
+
+        while frontier:
+            keys = set()
+            for chunk in self._chunks(list(frontier)):
+                keys.update(
+                    k
+                    for (k,) in db.execute(
+                        f"SELECT DISTINCT key FROM links WHERE member IN ({self._marks(chunk)})",
+                        chunk,
+                    )
+                )
+            keys -= seenKeys
+            seenKeys |= keys
+
+            frontier = set()
+            group = dict()
+            for chunk in self._chunks(list(keys)):
+                for k, m in db.execute(
+                    f"SELECT key, member FROM links WHERE key IN ({self._marks(chunk)})",
+                    chunk,
+                ):
+                    group.setdefault(k, []).append(m)
+                    if m not in seen:
+                        seen.add(m)
+                        frontier.add(m)
+
+            for ms in group.values():
+                for m in ms:
+                    parent.setdefault(m, m)
+                first = find(ms[0])
+                for m in ms[1:]:
+                    root = find(m)
+                    if root != first:
+                        parent[root] = first
+
+        components = dict()
+        for m in parent:
+            components.setdefault(find(m), []).append(m)
+
+        return components.values()
+
+    @staticmethod
+    def _chunks(items, size=500):
+
+        for i in range(0, len(items), size):
+            yield items[i : i + size]
+
+    @staticmethod
+    def _marks(chunk):
+
+        return ", ".join("?" * len(chunk))
+
+    def cluster(self, member):
+        """Return the cluster id of a member, or None."""
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT cluster FROM members WHERE member = ?", (memberKey(member),)
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def members(self, cluster: int, uris: bool = True):
+        """Return the members of a cluster, by default only the URIs."""
+
+        q = "SELECT member FROM members WHERE cluster = ?"
+        if uris:
+            q += " AND uri = 1"
+
+        with self.lock:
+            return sorted(m for (m,) in self.db.execute(q, (cluster,)))
+
+    def __getitem__(self, member):
+        """
+        Return the URIs that are the same as a member (a URI or an
+        (eventid, person) key), as in the former sameAs_mapping.json.
+        """
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT m.member FROM members AS k JOIN members AS m "
+                "ON m.cluster = k.cluster WHERE k.member = ? AND m.uri = 1 "
+                "ORDER BY m.member",
+                (memberKey(member),),
+            )
+
+            return [m for (m,) in row]
+
+    def __contains__(self, member):
+
+        return self.cluster(member) is not None
+
+    def toJSON(self, destination: str):
+        """
+        Write the former sameAs_mapping.json: URI --> list of URIs. The file
+        is compressed for a .gz or .zst destination. It is written to a
+        temporary file first and then moved into place, so that concurrent
+        conversions never leave a partly written file.
+        """
+
+        mapping = dict()
+        with self.lock:
+            for member, cluster in self.db.execute(
+                "SELECT member, cluster FROM members WHERE uri = 1"
+            ):
+                mapping.setdefault(cluster, []).append(member)
+
+        directory, name = os.path.split(destination)
+        tmp = os.path.join(directory, f".{os.getpid()}-{threading.get_ident()}-{name}")
+        with openFile(tmp, "w") as outfile:
+            json.dump(
+                {m: sorted(ms) for ms in mapping.values() for m in ms},
+                outfile,
+            )
+        os.replace(tmp, destination)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Look up the persons that are the same as a URI."
+    )
+    parser.add_argument("uri", nargs="+")
+    parser.add_argument("--path", default=SAMEASPATH, help="sqlite file")
+    args = parser.parse_args()
+
+    store = SameAsStore(args.path)
+    for uri in args.uri:
+        sys.stdout.write(json.dumps({uri: store[uri]}) + "\n")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Local HTTP lookup service for the GGD records, their RDF and the sameAs
+clusters.
+
+Usage (from the repository root):
+    python service.py --port 8080 --store Oxigraph
+
+Endpoints:
+    GET  /record/<id>                   record as JSON (ggd.json)
+    POST /records                       ["29", "407"] --> {id: record}
+    GET  /entity?uri=<uri>&format=...   description of a subject in turtle or json-ld
+    POST /entities?format=...           ["<uri>", ...] --> one graph
+    GET  /sameas?uri=<uri>              URIs in the same cluster
+    POST /sameas                        ["<uri>", ...] --> {uri: [uri]}
+"""
+
+import json
+import asyncio
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from rdflib import Graph, URIRef
+from rdflib.term import skolem_genid
+
+from records import RecordIndex, JSONFILE, INDEXPATH
+from sameas import SameAsStore, SAMEASPATH
+from store import openStore, STOREPATH, STORES
+
+KEEPALIVE = 15  # seconds an idle connection is kept open
+CACHESIZE = 10_000
+
+FORMATS = {
+    "turtle": "text/turtle; charset=utf-8",
+    "json-ld": "application/ld+json",
+}
+
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class LRUCache:
+    """Least recently used cache of at most `maxsize` responses."""
+
+    def __init__(self, maxsize: int = CACHESIZE):
+
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+
+        return value
+
+    def put(self, key, value):
+
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+def etagFor(body: bytes):
+
+    return '"' + hashlib.md5(body).hexdigest() + '"'
+
+
+class LookupService:
+    """
+    Answers the lookups from the indexed stores, with an LRU cache of
+    rendered responses.
+
+    Record responses get an ETag from the record id and its `modified`
+    date, so a client can revalidate without the record being serialized.
+    Entity and sameAs responses get an ETag from their content.
+
+    The lookups (sqlite, rdflib store) block, so `serve` runs them in a
+    thread pool instead of on the event loop. With the default of one
+    worker they are answered one at a time; more workers are only safe if
+    the RDF store can be read from several threads.
+
+    Args:
+        records (RecordIndex): The parsed records.
+        sameAs (SameAsStore): The sameAs clusters.
+        dataset (Graph): Graph or Dataset with the converted RDF, optional.
+        cacheSize (int): Number of cached responses.
+        workers (int): Number of threads for the lookups.
+    """
+
+    def __init__(
+        self,
+        records,
+        sameAs,
+        dataset=None,
+        cacheSize: int = CACHESIZE,
+        workers: int = 1,
+    ):
+
+        self.records = records
+        self.sameAs = sameAs
+        self.dataset = dataset
+        self.cache = LRUCache(cacheSize)
+        self.executor = ThreadPoolExecutor(workers)
+
+    def close(self):
+
+        self.executor.shutdown()
+        self.sameAs.close()
+
+    def record(self, recordID: str):
+        """Return (etag, body) for a record, or None."""
+
+        r = self.records.get(recordID)
+        if r is None:
+            return None
+
+        etag = f'"{recordID}-{r["modified"]}"'
+
+        cached = self.cache.get(("record", recordID))
+        if cached is None or cached[0] != etag:
+            cached = (etag, json.dumps(r).encode())
+            self.cache.put(("record", recordID), cached)
+
+        return cached
+
+    def describe(self, uris):
+        """
+        The triples of the subjects, with the skolemized nodes they refer
+        to (names, roles, ...) included recursively.
+        """
+
+        g = Graph()
+        for prefix, namespace in self.dataset.namespaces():
+            g.bind(prefix, namespace)
+
+        seen = set()
+        stack = [URIRef(uri) for uri in uris]
+        while stack:
+            s = stack.pop()
+            if s in seen:
+                continue
+            seen.add(s)
+
+            for _, p, o in self.dataset.triples((s, None, None)):
+                g.add((s, p, o))
+                if isinstance(o, URIRef) and skolem_genid in o:
+                    stack.append(o)
+
+        return g
+
+    def entities(self, uris, format: str):
+        """Return (etag, body) for the description of one or more subjects."""
+
+        key = ("entity", format, tuple(uris))
+
+        cached = self.cache.get(key)
+        if cached is None:
+            body = self.describe(uris).serialize(format=format).encode()
+            cached = (etagFor(body), body)
+            self.cache.put(key, cached)
+
+        return cached
+
+    def cluster(self, uri: str):
+
+        cached = self.cache.get(("sameas", uri))
+        if cached is None:
+            cached = self.sameAs[uri]
+            self.cache.put(("sameas", uri), cached)
+
+        return cached
+
+    def handle(self, method: str, target: str, headers: dict, body: bytes):
+        """
+        Answer one request.
+
+        Returns:
+            tuple: (status, content type, etag, body)
+        """
+
+        url = urlsplit(target)
+        path = unquote(url.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        # only the entity routes have a format
+        format = query.get("format")
+        if format is None:
+            format = "json-ld" if "ld+json" in headers.get("accept", "") else "turtle"
+
+        if method == "POST":
+            try:
+                keys = json.loads(body)
+            except ValueError:
+                return 400, None, None, b"Expected a JSON list in the body"
+            if type(keys) != list:
+                return 400, None, None, b"Expected a JSON list in the body"
+
+        if path.startswith("/record/") and method == "GET":
+            response = self.record(path[len("/record/") :])
+            if response is None:
+                return 404, None, None, b"Unknown record"
+            return (200, "application/json", *response)
+
+        elif path == "/records" and method == "POST":
+            result = {
+                k: json.loads(r[1]) if r else None
+                for k, r in ((k, self.record(k)) for k in keys)
+            }
+            body = json.dumps(result).encode()
+            return 200, "application/json", etagFor(body), body
+
+        elif path in ("/entity", "/entities") and self.dataset is None:
+            return 404, None, None, b"No RDF store configured"
+
+        elif path in ("/entity", "/entities") and format not in FORMATS:
+            return 400, None, None, f"Unknown format {format!r}".encode()
+
+        elif path == "/entity" and method == "GET":
+            if "uri" not in query:
+                return 400, None, None, b"Missing uri parameter"
+            return (200, FORMATS[format], *self.entities([query["uri"]], format))
+
+        elif path == "/entities" and method == "POST":
+            return (200, FORMATS[format], *self.entities(keys, format))
+
+        elif path == "/sameas" and method == "GET":
+            if "uri" not in query:
+                return 400, None, None, b"Missing uri parameter"
+            body = json.dumps(self.cluster(query["uri"])).encode()
+            return 200, "application/json", etagFor(body), body
+
+        elif path == "/sameas" and method == "POST":
+            body = json.dumps({k: self.cluster(k) for k in keys}).encode()
+            return 200, "application/json", etagFor(body), body
+
+        elif path in ("/records", "/entities", "/entity", "/sameas") or (
+            path.startswith("/record/")
+        ):
+            return 405, None, None, b"Method not allowed"
+
+        else:
+            return 404, None, None, b"Not found"
+
+    async def serve(self, reader, writer):
+        """Serve the requests of one (keep-alive) connection."""
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), KEEPALIVE)
+                except asyncio.TimeoutError:
+                    break
+                if not line:
+                    break
+
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    break
+
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get("connection", "").lower()
+                keepAlive = (
+                    connection == "keep-alive"
+                    if version == "HTTP/1.0"
+                    else connection != "close"
+                )
+
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+
+                if length < 0:
+                    # the end of the body is unknown, so is the next request
+                    status, contentType, etag = 400, None, None
+                    body = b"Invalid Content-Length"
+                    keepAlive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+
+                    try:
+                        status, contentType, etag, body = await loop.run_in_executor(
+                            self.executor, self.handle, method, target, headers, body
+                        )
+                    except Exception as e:
+                        status, contentType, etag = 500, None, None
+                        body = str(e).encode()
+
+                if etag and etag == headers.get("if-none-match"):
+                    status, body = 304, b""
+
+                head = [f"HTTP/1.1 {status} {REASONS[status]}"]
+                head.append(f"Content-Type: {contentType or 'text/plain'}")
+                head.append(f"Content-Length: {len(body)}")
+                if etag:
+                    head.append(f"ETag: {etag}")
+                head.append(f"Connection: {'keep-alive' if keepAlive else 'close'}")
+                if keepAlive:
+                    head.append(f"Keep-Alive: timeout={KEEPALIVE}")
+
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+                writer.write(body)
+                await writer.drain()
+
+                if not keepAlive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def run(service: LookupService, host: str = "127.0.0.1", port: int = 8080):
+
+    server = await asyncio.start_server(service.serve, host, port)
+    print(f"Serving on http://{host}:{port}")
+
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--json", default=JSONFILE, help="parsed records")
+    parser.add_argument("--index", default=INDEXPATH, help="record index file")
+    parser.add_argument("--sameas", default=SAMEASPATH, help="sameAs sqlite file")
+    parser.add_argument(
+        "--store", choices=list(STORES), help="serve RDF from this store"
+    )
+    parser.add_argument("--path", default=STOREPATH, help="store directory")
+    parser.add_argument("--cache", type=int, default=CACHESIZE)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="threads for the lookups"
+    )
+    args = parser.parse_args()
+
+    dataset = openStore(args.path, store=args.store) if args.store else None
+
+    service = LookupService(
+        RecordIndex.fromFile(args.json, args.index),
+        SameAsStore(args.sameas),
+        dataset=dataset,
+        cacheSize=args.cache,
+        workers=args.workers,
+    )
+
+    try:
+        asyncio.run(run(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        if dataset is not None:
+            dataset.close()
+
+
+if __name__ == "__main__":
+    main()
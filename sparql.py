@@ -0,0 +1,62 @@
+import os
+import sys
+import argparse
+
+from store import openStore, STOREPATH, STORES
+
+
+def query(q: str, path: str = STOREPATH, store: str = "Oxigraph"):
+    """
+    Run a SPARQL query against a persistent store filled by `toRdf`.
+
+    Args:
+        q (str): The SPARQL query.
+        path (str): Directory of the store.
+        store (str): Name of the rdflib store plugin.
+
+    Returns:
+        Result: rdflib query result, materialised before the store is closed.
+    """
+
+    ds = openStore(path, store=store)
+
+    try:
+        result = ds.query(q)
+        result.bindings  # materialise the result while the store is open
+    finally:
+        ds.close()
+
+    return result
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Query the GGD graph in a persistent store with SPARQL."
+    )
+    parser.add_argument("query", help="SPARQL query string or path to a .rq file")
+    parser.add_argument("--path", default=STOREPATH, help="store directory")
+    parser.add_argument("--store", default="Oxigraph", choices=list(STORES))
+    parser.add_argument(
+        "--format",
+        default="csv",
+        choices=["csv", "json", "xml", "txt"],
+        help="output format for SELECT/ASK results",
+    )
+    args = parser.parse_args()
+
+    q = args.query
+    if os.path.isfile(q):
+        with open(q) as infile:
+            q = infile.read()
+
+    result = query(q, path=args.path, store=args.store)
+
+    if result.type == "CONSTRUCT" or result.type == "DESCRIBE":
+        sys.stdout.write(result.serialize(format="turtle").decode())
+    else:
+        sys.stdout.write(result.serialize(format=args.format).decode())
+
+
+if __name__ == "__main__":
+    main()
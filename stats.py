@@ -0,0 +1,246 @@
+"""
+VoID statistics of a converted graph, and a check of a run against the
+statistics of a baseline run.
+
+Usage (from the repository root):
+    python stats.py rdf/ggd.void.ttl rdf/baseline.void.ttl
+"""
+
+import os
+import sys
+import math
+import hashlib
+import argparse
+from collections import Counter
+
+from rdflib import Graph, Namespace, Literal, URIRef, BNode, RDF
+from rdflib.term import skolem_genid
+
+from utils import stripCompression
+
+void = Namespace("http://rdfs.org/ns/void#")
+schema = Namespace("https://schema.org/")
+
+# Classes whose number of entities must not change between runs by default
+CHECKCLASSES = (schema.Person, schema.Organization)
+
+
+class DistinctEstimate:
+    """
+    HyperLogLog estimate of the number of distinct RDF terms, in 2**precision
+    bytes instead of a set of all terms (standard error 1.04 / sqrt(2**precision),
+    about 0.8% by default). Small counts are (nearly) exact.
+    """
+
+    def __init__(self, precision: int = 14):
+
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, term):
+
+        h = int.from_bytes(
+            hashlib.blake2b(term.n3().encode(), digest_size=8).digest(), "big"
+        )
+        bits = 64 - self.precision
+        i, rest = h >> bits, h & ((1 << bits) - 1)
+        rank = bits - rest.bit_length() + 1
+        if rank > self.registers[i]:
+            self.registers[i] = rank
+
+    def __len__(self):
+
+        m = len(self.registers)
+        estimate = (
+            0.7213 / (1 + 1.079 / m) * m * m / sum(2.0**-r for r in self.registers)
+        )
+
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting
+
+        return round(estimate)
+
+
+class GraphStatistics:
+    """
+    Running counters over the triples of a graph, reported as VoID.
+
+    Counts triples per predicate, entities per rdf:type, distinct (typed)
+    subjects, the skolemized nodes and an estimate of the distinct objects,
+    so that a run can be checked for regressions without loading the
+    serialized graph again.
+    """
+
+    def __init__(self):
+
+        self.triples = 0
+        self.predicates = Counter()
+        self.classes = Counter()
+        self.subjects = set()
+        self.typed = set()
+        self.objects = DistinctEstimate()
+        self.skolemObjects = set()
+
+    def add(self, triple):
+
+        s, p, o = triple
+
+        self.triples += 1
+        self.predicates[p] += 1
+        self.subjects.add(s)
+        self.objects.add(o)
+
+        if isinstance(o, URIRef) and skolem_genid in o:
+            self.skolemObjects.add(o)
+
+        if p == RDF.type:
+            self.classes[o] += 1
+            self.typed.add(s)
+
+    def update(self, triples):
+
+        for triple in triples:
+            self.add(triple)
+
+        return self
+
+    @property
+    def skolemized(self):
+        """Number of distinct skolemized (former blank) nodes."""
+
+        return len(
+            self.skolemObjects.union(
+                s for s in self.subjects if isinstance(s, URIRef) and skolem_genid in s
+            )
+        )
+
+    def toGraph(self, dataset: URIRef):
+        """
+        Return the statistics as a VoID description of `dataset`, with a
+        void:classPartition per rdf:type and a void:propertyPartition per
+        predicate. void:entities counts the typed resources once, whatever
+        their number of types; void:distinctObjects is an estimate.
+        """
+
+        g = Graph()
+        g.bind("void", void)
+
+        g.add((dataset, RDF.type, void.Dataset))
+        g.add((dataset, void.triples, Literal(self.triples)))
+        g.add((dataset, void.entities, Literal(len(self.typed))))
+        g.add((dataset, void.classes, Literal(len(self.classes))))
+        g.add((dataset, void.properties, Literal(len(self.predicates))))
+        g.add((dataset, void.distinctSubjects, Literal(len(self.subjects))))
+        g.add((dataset, void.distinctObjects, Literal(len(self.objects))))
+
+        for c, n in sorted(self.classes.items()):
+            partition = BNode()
+            g.add((dataset, void.classPartition, partition))
+            g.add((partition, void["class"], c))
+            g.add((partition, void.entities, Literal(n)))
+
+        for p, n in sorted(self.predicates.items()):
+            partition = BNode()
+            g.add((dataset, void.propertyPartition, partition))
+            g.add((partition, void.property, p))
+            g.add((partition, void.triples, Literal(n)))
+
+        return g
+
+    def report(self):
+
+        print(f"{'triples':55} {self.triples:>10}")
+        print(f"{'distinct subjects':55} {len(self.subjects):>10}")
+        print(f"{'entities':55} {len(self.typed):>10}")
+        print(f"{'skolemized nodes':55} {self.skolemized:>10}")
+        for c, n in self.classes.most_common():
+            print(f"{c.n3():55} {n:>10}")
+
+
+def statisticsPath(target: str):
+    """rdf/ggd.trig (or rdf/ggd.trig.gz) --> rdf/ggd.void.ttl"""
+
+    return os.path.splitext(stripCompression(target))[0] + ".void.ttl"
+
+
+def writeStatistics(g, destination: str):
+    """
+    Count the triples of a graph and write the VoID statistics.
+
+    Args:
+        g (Graph): The converted graph.
+        destination (str): Path of the Turtle file.
+
+    Returns:
+        GraphStatistics: The counters.
+    """
+
+    statistics = GraphStatistics().update(g)
+    statistics.toGraph(g.identifier).serialize(destination, format="turtle")
+
+    return statistics
+
+
+def readStatistics(path: str):
+    """
+    Read the class partitions of a VoID file written by `writeStatistics`.
+
+    Returns:
+        Counter: class --> number of entities
+    """
+
+    g = Graph().parse(path, format="turtle")
+
+    return Counter(
+        {
+            g.value(partition, void["class"]): int(g.value(partition, void.entities))
+            for partition in g.objects(None, void.classPartition)
+        }
+    )
+
+
+def checkStatistics(path: str, baseline: str, classes=CHECKCLASSES):
+    """
+    Compare the number of entities per class of a run with a baseline run,
+    e.g. to check that no Person or Organization was merged away.
+
+    Args:
+        path (str): VoID file of the run.
+        baseline (str): VoID file of the baseline run.
+        classes: The classes to compare.
+
+    Returns:
+        dict: class --> (baseline count, count), for the classes that differ.
+    """
+
+    counts, expected = readStatistics(path), readStatistics(baseline)
+
+    return {c: (expected[c], counts[c]) for c in classes if expected[c] != counts[c]}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("void", help="VoID file of the run")
+    parser.add_argument("baseline", help="VoID file of the baseline run")
+    parser.add_argument(
+        "--classes",
+        nargs="+",
+        default=[str(c) for c in CHECKCLASSES],
+        help="class URIs to compare",
+    )
+    args = parser.parse_args()
+
+    differences = checkStatistics(
+        args.void, args.baseline, [URIRef(c) for c in args.classes]
+    )
+
+    for c, (expected, n) in differences.items():
+        print(f"{c.n3():55} {expected:>10} -> {n}")
+
+    sys.exit(1 if differences else 0)
+
+
+if __name__ == "__main__":
+    main()
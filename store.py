@@ -0,0 +1,195 @@
+from itertools import islice
+
+from rdflib import Dataset, Graph, URIRef
+from rdflib.term import Node
+
+GGDGRAPH = URIRef("https://data.goldenagents.org/datasets/ggd/")
+
+STOREPATH = "rdf/ggd.store"
+BATCHSIZE = 100_000
+
+# rdflib store plugin name --> module that has to be installed for it
+STORES = {
+    "Oxigraph": "oxrdflib",
+    "BerkeleyDB": "berkeleydb",
+}
+
+
+def openStore(path: str = STOREPATH, store: str = "Oxigraph", create=False):
+    """
+    Open a persistent on-disk rdflib store as a Dataset.
+
+    The Dataset uses the union of all named graphs as its default graph, so
+    SPARQL queries against the store see the GGD graph without a GRAPH clause.
+
+    Args:
+        path (str): Directory of the store.
+        store (str): Name of the rdflib store plugin (Oxigraph or BerkeleyDB).
+        create (bool): Create the store if it does not yet exist.
+
+    Returns:
+        Dataset: the opened Dataset. Close it when done.
+    """
+
+    if store not in STORES:
+        raise ValueError(f"Unknown store {store!r}, choose from: {', '.join(STORES)}")
+
+    try:
+        __import__(STORES[store])
+    except ImportError:
+        raise ImportError(
+            f"The {store} store requires the {STORES[store]!r} package"
+        ) from None
+
+    ds = Dataset(store=store, default_union=True)
+    ds.open(path, create=create)
+
+    return ds
+
+
+def chunked(iterable, size: int):
+
+    iterator = iter(iterable)
+
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BufferedGraph(Graph):
+    """
+    Graph that collects added triples and commits them to its store with
+    `addN` in chunks of `batchSize`, instead of one index update per `add`.
+
+    Pending triples are kept per (subject, predicate), so that the
+    remove-then-add pattern of rdfalchemy property setters is resolved in the
+    buffer without touching the store. Lookups with a bound subject and
+    predicate see pending triples (once, also when the store already has
+    them); any other read flushes the buffer first.
+    """
+
+    def __init__(self, *args, batchSize: int = BATCHSIZE, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.batchSize = batchSize
+        self._pending = dict()
+        self._size = 0
+
+    def flush(self):
+        """Commit all pending triples to the store."""
+
+        if self._pending:
+            super().addN(
+                (s, p, o, self)
+                for (s, p), objects in self._pending.items()
+                for o in objects
+            )
+            self._pending.clear()
+            self._size = 0
+
+    def add(self, triple):
+        s, p, o = triple
+        assert isinstance(s, Node), "Subject %s must be an rdflib term" % (s,)
+        assert isinstance(p, Node), "Predicate %s must be an rdflib term" % (p,)
+        assert isinstance(o, Node), "Object %s must be an rdflib term" % (o,)
+
+        objects = self._pending.setdefault((s, p), dict())
+        if o not in objects:
+            objects[o] = None
+            self._size += 1
+
+            if self._size >= self.batchSize:
+                self.flush()
+
+        return self
+
+    def addN(self, quads):
+        self.flush()
+        return super().addN(quads)
+
+    def remove(self, triple):
+        s, p, o = triple
+
+        if s is not None and p is not None:
+            objects = self._pending.get((s, p))
+            if objects:
+                if o is None:
+                    self._size -= len(objects)
+                    del self._pending[(s, p)]
+                elif o in objects:
+                    self._size -= 1
+                    del objects[o]
+        else:
+            self.flush()
+
+        return super().remove(triple)
+
+    def triples(self, triple):
+        s, p, o = triple
+
+        if s is not None and p is not None and (s, p) in self._pending:
+            stored = set()
+            for t in super().triples(triple):
+                stored.add(t[2])
+                yield t
+
+            # pending triples that were added again after a flush are stored
+            for pending in tuple(self._pending.get((s, p), ())):
+                if (o is None or o == pending) and pending not in stored:
+                    yield s, p, pending
+        else:
+            self.flush()
+
+            for t in super().triples(triple):
+                yield t
+
+    def __len__(self):
+        self.flush()
+        return super().__len__()
+
+
+def loadGraph(
+    g, path: str = STOREPATH, store: str = "Oxigraph", batchSize: int = BATCHSIZE
+):
+    """
+    Bulk load a graph into a named graph of a persistent store.
+
+    Triples are passed to the store with `addN` in chunks of `batchSize`, so
+    that the store can write its indexes per batch instead of per triple.
+    Existing triples in the named graph are replaced.
+
+    The graph is copied from memory: toRdf builds (and skolemizes) the whole
+    graph before it is loaded, so the store adds to the peak memory of a
+    conversion rather than lowering it.
+
+    Args:
+        g (Graph): The graph to load. Its identifier becomes the graph name.
+        path (str): Directory of the store.
+        store (str): Name of the rdflib store plugin (Oxigraph or BerkeleyDB).
+        batchSize (int): Number of triples per `addN` call.
+
+    Returns:
+        int: The number of loaded triples.
+    """
+
+    ds = openStore(path, store=store, create=True)
+
+    try:
+        context = ds.graph(g.identifier)
+        context.remove((None, None, None))
+
+        for prefix, namespace in g.namespaces():
+            ds.bind(prefix, namespace)
+
+        n = 0
+        for chunk in chunked(((s, p, o, context) for s, p, o in g), batchSize):
+            ds.addN(chunk)
+            n += len(chunk)
+
+        ds.commit()
+    finally:
+        ds.close()
+
+    return n
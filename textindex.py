@@ -0,0 +1,303 @@
+import os
+import json
+import mmap
+import struct
+import hashlib
+from bisect import bisect_left
+
+from utils import spellingKey
+
+TEXTINDEX = "data/ggd.textindex"
+
+# Fields of a parsed record that are indexed
+FIELDS = ("title", "description", "comments", "impressum")
+
+MAGIC = b"GGDTXT01"
+
+# magic, number of terms, number of records, offsets of the record entries,
+# record id blob, term entries, term blob and postings
+HEADER = struct.Struct("<8sII5Q")
+DOC = struct.Struct("<IH")  # offset and length of the record id in its blob
+TERM = struct.Struct("<IHQI")  # offset and length of the term, postings, count
+POSTING = struct.Struct("<IH")  # record number, term frequency
+
+
+def tokenize(text: str):
+    """
+    Split a text into search terms, without diacritics and with historic
+    spelling variants folded: "Bruylofts-Gedicht" --> ["bruylofts", "gedikht"].
+    """
+
+    return [token for token in spellingKey(text).split() if len(token) > 1]
+
+
+def recordText(r: dict):
+
+    text = []
+    for field in FIELDS:
+        value = r.get(field)
+        if type(value) == list:
+            text += value
+        elif value:
+            text.append(value)
+
+    return " ".join(text)
+
+
+def termFrequencies(r: dict):
+    """term --> frequency in the indexed fields of a parsed record."""
+
+    tf = dict()
+    for token in tokenize(recordText(r)):
+        tf[token] = tf.get(token, 0) + 1
+
+    return tf
+
+
+def writeTextIndex(docs: dict, path: str = TEXTINDEX):
+    """
+    Write the index file.
+
+    Args:
+        docs (dict): record id --> {term: frequency}
+        path (str): Path of the index file.
+    """
+
+    ids = sorted(docs)
+    postings = dict()
+    for n, recordID in enumerate(ids):
+        for term, tf in docs[recordID].items():
+            postings.setdefault(term.encode("utf-8"), []).append((n, min(tf, 0xFFFF)))
+    terms = sorted(postings)
+
+    idBlob = b"".join(i.encode("utf-8") for i in ids)
+    termBlob = b"".join(terms)
+
+    docEntries = bytearray()
+    offset = 0
+    for i in ids:
+        length = len(i.encode("utf-8"))
+        docEntries += DOC.pack(offset, length)
+        offset += length
+
+    termEntries = bytearray()
+    postingBlob = bytearray()
+    offset = 0
+    for term in terms:
+        # highest term frequency first, so that ranked results come first
+        plist = sorted(postings[term], key=lambda p: (-p[1], p[0]))
+        termEntries += TERM.pack(offset, len(term), len(postingBlob), len(plist))
+        offset += len(term)
+        for p in plist:
+            postingBlob += POSTING.pack(*p)
+
+    sections = [docEntries, idBlob, termEntries, termBlob, postingBlob]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+
+    # write next to the old file and swap, so open readers keep a valid map
+    with open(path + ".tmp", "wb") as outfile:
+        outfile.write(HEADER.pack(MAGIC, len(terms), len(ids), *offsets))
+        for section in sections:
+            outfile.write(section)
+    os.replace(path + ".tmp", path)
+
+
+def digest(r: dict):
+
+    return hashlib.md5(recordText(r).encode("utf-8")).hexdigest()
+
+
+def updateTextIndex(records: list, path: str = TEXTINDEX):
+    """
+    Bring the index in line with the records. Only new and changed records
+    are tokenized again; the term frequencies of the others are read back
+    from the current index. The record digests are kept in `<path>.docs.json`.
+
+    Args:
+        records (list): Parsed records.
+        path (str): Path of the index file.
+
+    Returns:
+        int: The number of added, changed or removed records.
+    """
+
+    digestPath = path + ".docs.json"
+
+    if os.path.exists(path) and os.path.exists(digestPath):
+        with open(digestPath) as infile:
+            digests = json.load(infile)
+        with TextIndex(path) as index:
+            docs = index.termFrequencies()
+    else:
+        digests, docs = dict(), dict()
+
+    current = {r["id"]: r for r in records}
+    changed = 0
+
+    for recordID in list(docs):
+        if recordID not in current:
+            del docs[recordID]
+            digests.pop(recordID, None)
+            changed += 1
+
+    for recordID, r in current.items():
+        d = digest(r)
+        if digests.get(recordID) != d:
+            docs[recordID] = termFrequencies(r)
+            digests[recordID] = d
+            changed += 1
+
+    if changed or not os.path.exists(path):
+        writeTextIndex(docs, path)
+        with open(digestPath, "w") as outfile:
+            json.dump(digests, outfile)
+
+    return changed
+
+
+class TextIndex:
+    """
+    Inverted index over the titles, descriptions, comments and impressum
+    of the records, memory-mapped from the file written by
+    `updateTextIndex`.
+
+    A term lookup is a binary search in the mapped term table; only the
+    postings of the query terms are read.
+
+    Args:
+        path (str): Path of the index file.
+    """
+
+    def __init__(self, path: str = TEXTINDEX):
+
+        with open(path, "rb") as infile:
+            self.mm = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            self.nTerms,
+            self.nDocs,
+            self.docOffset,
+            self.idOffset,
+            self.termOffset,
+            self.termBlobOffset,
+            self.postingOffset,
+        ) = HEADER.unpack_from(self.mm, 0)
+
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a text index")
+
+    def close(self):
+
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _term(self, n: int):
+
+        offset, length, postings, count = TERM.unpack_from(
+            self.mm, self.termOffset + n * TERM.size
+        )
+        start = self.termBlobOffset + offset
+
+        return self.mm[start : start + length], postings, count
+
+    def _recordID(self, n: int):
+
+        offset, length = DOC.unpack_from(self.mm, self.docOffset + n * DOC.size)
+        start = self.idOffset + offset
+
+        return self.mm[start : start + length].decode("utf-8")
+
+    def _postings(self, postings: int, count: int):
+
+        start = self.postingOffset + postings
+        return POSTING.iter_unpack(self.mm[start : start + count * POSTING.size])
+
+    def lookup(self, term: str):
+        """
+        Postings of a (normalised) term.
+
+        Returns:
+            list: (record id, term frequency), highest frequency first.
+        """
+
+        key = term.encode("utf-8")
+        terms = _TermView(self)
+        n = bisect_left(terms, key)
+
+        if n == self.nTerms:
+            return []
+
+        found, postings, count = self._term(n)
+        if found != key:
+            return []
+
+        return [
+            (self._recordID(doc), tf) for doc, tf in self._postings(postings, count)
+        ]
+
+    def search(self, query: str, every: bool = False, limit: int = None):
+        """
+        Record ids for a query, ranked by the summed frequency of the query
+        terms. The query is normalised like the indexed text.
+
+        Args:
+            query (str): Words to search for.
+            every (bool): Only records that contain every query term.
+            limit (int): Maximum number of results.
+
+        Returns:
+            list: (record id, score), best first.
+        """
+
+        terms = tokenize(query)
+        scores = dict()
+        matched = dict()
+
+        for term in dict.fromkeys(terms):
+            for recordID, tf in self.lookup(term):
+                scores[recordID] = scores.get(recordID, 0) + tf
+                matched[recordID] = matched.get(recordID, 0) + 1
+
+        if every:
+            scores = {k: v for k, v in scores.items() if matched[k] == len(set(terms))}
+
+        ranked = sorted(scores.items(), key=lambda i: (-i[1], i[0]))
+
+        return ranked[:limit] if limit else ranked
+
+    def termFrequencies(self):
+        """record id --> {term: frequency}, read back from the index."""
+
+        docs = {self._recordID(n): dict() for n in range(self.nDocs)}
+        ids = list(docs)
+
+        for n in range(self.nTerms):
+            term, postings, count = self._term(n)
+            term = term.decode("utf-8")
+            for doc, tf in self._postings(postings, count):
+                docs[ids[doc]][term] = tf
+
+        return docs
+
+
+class _TermView:
+    """Sequence of the terms in an index, for bisect."""
+
+    def __init__(self, index: TextIndex):
+        self.index = index
+
+    def __len__(self):
+        return self.index.nTerms
+
+    def __getitem__(self, n: int):
+        return self.index._term(n)[0]
@@ -0,0 +1,342 @@
+import gc
+import os
+import sys
+import gzip
+import json
+import unicodedata
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+from rdflib import Literal
+
+
+def internValue(value):
+    """Intern a string, or the strings in a list. Other values are returned as is."""
+
+    if type(value) is str:
+        return sys.intern(value)
+    elif type(value) is list:
+        return [internValue(i) for i in value]
+    else:
+        return value
+
+
+def internPairs(pairs):
+    """
+    `object_pairs_hook` for json.load that interns keys and string values.
+
+    Names and URIs (thesaurus, gender, place) occur thousands of times across
+    the enrichment tables and records. Interning makes every occurrence share
+    one str object.
+    """
+
+    return {sys.intern(k): internValue(v) for k, v in pairs}
+
+
+def stripDiacritics(s: str):
+    """Remove accents and other combining marks: "Hoófd" --> "Hoofd"."""
+
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c)
+    )
+
+
+def normaliseName(name: str):
+    """
+    Normalise a name for matching: no diacritics, lower case, punctuation
+    as spaces and single spaces. "Barentsz., Hendrick" --> "barentsz hendrick"
+    """
+
+    name = stripDiacritics(name).casefold()
+    name = "".join(c if c.isalnum() else " " for c in name)
+
+    return " ".join(name.split())
+
+
+# Historic Dutch spelling variants, applied in order to a normalised string:
+# Pieterszoon / Pietersz, Huygens / Huijgens / Huigens, Cornelisz / Kornelisz
+SPELLING = [
+    ("szoon", "sz"),
+    ("sen", "s"),
+    ("ij", "y"),
+    ("ey", "y"),
+    ("ui", "uy"),
+    ("ck", "k"),
+    ("c", "k"),
+    ("ph", "f"),
+    ("gh", "g"),
+    ("th", "t"),
+    ("ae", "a"),
+    ("aa", "a"),
+    ("oo", "o"),
+    ("ee", "e"),
+    ("uu", "u"),
+    ("z", "s"),
+    ("w", "v"),
+]
+
+
+def spellingKey(s: str):
+    """Normalise a name (or word) and fold historic spelling variants."""
+
+    s = normaliseName(s)
+    for old, new in SPELLING:
+        s = s.replace(old, new)
+
+    return s
+
+
+# Compression by file extension, with the default level of each
+COMPRESSION = {
+    ".gz": "gzip",
+    ".zst": "zstd",
+}
+COMPRESSIONLEVEL = {
+    "gzip": 6,
+    "zstd": 3,
+}
+
+
+def compression(filepath: str):
+    """Compression of a path from its extension: gzip, zstd or None."""
+
+    return COMPRESSION.get(os.path.splitext(filepath)[1])
+
+
+def stripCompression(filepath: str):
+    """rdf/ggd.trig.gz --> rdf/ggd.trig"""
+
+    if compression(filepath):
+        return os.path.splitext(filepath)[0]
+
+    return filepath
+
+
+def openFile(
+    filepath: str,
+    mode: str = "r",
+    encoding: str = "utf-8",
+    level: int = None,
+    threads: int = -1,
+):
+    """
+    Open a file like `open`, compressed or decompressed on the fly when the
+    path ends in .gz or .zst.
+
+    zstd needs the optional `zstandard` package; it compresses in `threads`
+    threads (-1: one per cpu).
+
+    Args:
+        filepath (str): Path to the file.
+        mode (str): "r", "w", "rb", "wb", ...
+        encoding (str): Encoding in text mode.
+        level (int): Compression level, default from COMPRESSIONLEVEL.
+        threads (int): Compression threads for zstd.
+
+    Returns:
+        A file object.
+    """
+
+    codec = compression(filepath)
+
+    if codec is None:
+        if "b" in mode:
+            return open(filepath, mode)
+        return open(filepath, mode, encoding=encoding)
+
+    if "b" not in mode and "t" not in mode:
+        mode += "t"  # text, as for open
+    if "b" in mode:
+        encoding = None
+    if level is None:
+        level = COMPRESSIONLEVEL[codec]
+
+    if codec == "gzip":
+        return gzip.open(filepath, mode, compresslevel=level, encoding=encoding)
+
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            f"Reading or writing {filepath} requires the 'zstandard' package"
+        ) from None
+
+    return zstandard.open(
+        filepath,
+        mode,
+        cctx=zstandard.ZstdCompressor(level=level, threads=threads),
+        encoding=encoding,
+    )
+
+
+def nquad(triple, graph=None):
+    """
+    An N-Quads line for a triple, in the named graph `graph` or, if None, in
+    the default graph.
+
+    Literals are escaped as in N-Triples. Literal.n3() is not used for
+    them, because it writes values with a newline in triple quotes.
+    """
+
+    s, p, o = triple
+
+    if isinstance(o, Literal):
+        value = (
+            str(o)
+            .replace("\\", "\\\\")
+            .replace("\n", "\\n")
+            .replace('"', '\\"')
+            .replace("\r", "\\r")
+        )
+        if o.language:
+            o = f'"{value}"@{o.language}'
+        elif o.datatype:
+            o = f'"{value}"^^<{o.datatype}>'
+        else:
+            o = f'"{value}"'
+    else:
+        o = o.n3()
+
+    if graph is None:
+        return f"{s.n3()} {p.n3()} {o} .\n"
+
+    return f"{s.n3()} {p.n3()} {o} {graph.n3()} .\n"
+
+
+def loadJSON(filepath: str, intern: bool = True):
+    """
+    Load a JSON file, by default with interned keys and string values.
+
+    Args:
+        filepath (str): Path to the JSON file.
+        intern (bool): Intern strings while decoding.
+
+    Returns:
+        The decoded JSON.
+    """
+
+    with openFile(filepath) as infile:
+        if intern:
+            return internValue(json.load(infile, object_pairs_hook=internPairs))
+        else:
+            return json.load(infile)
+
+
+def internAll(obj):
+    """Return a copy of decoded JSON with all keys and strings interned."""
+
+    if type(obj) is str:
+        return sys.intern(obj)
+    elif type(obj) is dict:
+        return {sys.intern(k): internAll(v) for k, v in obj.items()}
+    elif type(obj) is list:
+        return [internAll(i) for i in obj]
+    else:
+        return obj
+
+
+def loadJSONFiles(filepaths: list, workers: int = 1, intern: bool = True):
+    """
+    Load several JSON files, one after another or, when asked for, in a
+    process pool.
+
+    JSON decoding is CPU-bound and holds the GIL, so threads do not help.
+    With more than one worker each file is decoded in a forked process and
+    sent back pickled. Strings are interned again in this process, because
+    interning in a worker does not carry over. The pool is opt-in: forking
+    from a module that is being imported (or from a threaded program) is not
+    safe, so module level tables are loaded serially. Without fork the files
+    are always loaded one after another.
+
+    Args:
+        filepaths (list): Paths to the JSON files.
+        workers (int): Number of processes, 1 (default) loads the files in
+            this process, None uses one process per cpu.
+        intern (bool): Intern strings while decoding.
+
+    Returns:
+        list: The decoded JSON, in the order of `filepaths`.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(filepaths))
+
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return [loadJSON(f, intern=intern) for f in filepaths]
+
+    with ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context("fork")
+    ) as pool:
+        tables = list(pool.map(loadJSON, filepaths, [False] * len(filepaths)))
+
+    if intern:
+        tables = [internAll(t) for t in tables]
+
+    return tables
+
+
+@contextmanager
+def pausedGC():
+    """
+    Pause the cyclic garbage collector, e.g. while building many records.
+
+    Parsing creates millions of container objects that stay alive, which
+    only makes the collector rescan them over and over.
+    """
+
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def deepSizeOf(obj, seen=None):
+    """
+    Size in bytes of an object and everything it contains (dicts, lists,
+    tuples, sets). Objects that are shared are counted once.
+    """
+
+    if seen is None:
+        seen = set()
+
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += deepSizeOf(k, seen) + deepSizeOf(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for i in obj:
+            size += deepSizeOf(i, seen)
+
+    return size
+
+
+def memoryReport(tables: dict):
+    """
+    Print the deep size of each table, and of all tables together (shared
+    strings counted once).
+
+    Args:
+        tables (dict): name --> loaded table
+    """
+
+    seen = set()
+    total = 0
+
+    for name, table in tables.items():
+        size = deepSizeOf(table)
+        total += deepSizeOf(table, seen)
+        print(f"{name:30} {size / 2**20:10.2f} MB")
+
+    print(f"{'total (shared counted once)':30} {total / 2**20:10.2f} MB")
+
+    return total
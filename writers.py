@@ -0,0 +1,265 @@
+import re
+import json
+from contextlib import ExitStack
+
+from rdflib import Namespace, Literal, URIRef, RDF
+
+from partition import ownership
+from utils import openFile, stripCompression, nquad
+
+schema = Namespace("https://schema.org/")
+
+# Local names that can be written as prefix:local
+LOCALNAME = re.compile(r"\w[\w\-]*\Z")
+
+
+class Names:
+    """Compact IRIs with the namespaces bound in a graph."""
+
+    def __init__(self, g):
+
+        self.prefixes = {
+            str(namespace): prefix
+            for prefix, namespace in g.namespaces()
+            if prefix and str(namespace)[-1] in "/#"
+        }
+
+    def compact(self, uri: str):
+        """prefix:local, or None if there is no (valid) prefix for the IRI."""
+
+        i = max(uri.rfind("/"), uri.rfind("#")) + 1
+        prefix = self.prefixes.get(uri[:i])
+
+        if prefix is not None and LOCALNAME.match(uri[i:]):
+            return f"{prefix}:{uri[i:]}"
+
+        return None
+
+
+class NQuadsWriter:
+    """N-Quads, in the named graph of the converted graph."""
+
+    def __init__(self, outfile, g):
+
+        self.outfile = outfile
+        self.identifier = g.identifier
+
+    def group(self, root, subjects: list):
+
+        for _, triples in subjects:
+            for triple in triples:
+                self.outfile.write(nquad(triple, self.identifier))
+
+    def close(self):
+        pass
+
+
+class TriGWriter:
+    """TriG, written subject by subject with the prefixes of the graph."""
+
+    def __init__(self, outfile, g):
+
+        self.outfile = outfile
+        self.names = Names(g)
+
+        for namespace, prefix in self.names.prefixes.items():
+            outfile.write(f"@prefix {prefix}: <{namespace}> .\n")
+        outfile.write(f"\n{g.identifier.n3()} {{\n")
+
+    def term(self, t):
+
+        if isinstance(t, URIRef):
+            return self.names.compact(t) or t.n3()
+        elif isinstance(t, Literal) and t.datatype:
+            datatype = self.names.compact(t.datatype) or t.datatype.n3()
+            return Literal(str(t)).n3() + "^^" + datatype
+        else:
+            return t.n3()
+
+    def group(self, root, subjects: list):
+
+        for s, triples in subjects:
+            objects = dict()
+            for _, p, o in triples:
+                objects.setdefault(p, []).append(self.term(o))
+
+            statements = [
+                ("a" if p == RDF.type else self.term(p)) + " " + ", ".join(os)
+                for p, os in objects.items()
+            ]
+            self.outfile.write(
+                f"\n{self.term(s)} " + " ;\n    ".join(statements) + " .\n"
+            )
+
+    def close(self):
+
+        self.outfile.write("}\n")
+
+
+class JSONLDWriter:
+    """
+    JSON-LD, framed per schema:Book: every Book is a top level node in which
+    the nodes it owns (items, roles, names, ...) are embedded. Shared nodes
+    (events, places and persons of several Books) and other Books are
+    referred to by @id; the shared nodes follow the Books as top level
+    nodes, without embedding.
+    """
+
+    def __init__(self, outfile, g):
+
+        self.outfile = outfile
+        self.names = Names(g)
+        self.first = True
+
+        context = {
+            prefix: namespace for namespace, prefix in self.names.prefixes.items()
+        }
+        outfile.write(
+            '{"@context": '
+            + json.dumps(context)
+            + ', "@id": '
+            + json.dumps(str(g.identifier))
+            + ', "@graph": [\n'
+        )
+
+    def iri(self, uri):
+
+        return self.names.compact(uri) or str(uri)
+
+    def value(self, o):
+
+        if not isinstance(o, Literal):
+            return {"@id": self.iri(o)}
+        elif o.language:
+            return {"@value": str(o), "@language": o.language}
+        elif o.datatype:
+            return {"@value": str(o), "@type": self.iri(o.datatype)}
+        else:
+            return str(o)
+
+    def node(self, s, triples: list):
+
+        node = {"@id": self.iri(s)}
+        for _, p, o in triples:
+            if p == RDF.type:
+                node.setdefault("@type", []).append(self.iri(o))
+            else:
+                node.setdefault(self.iri(p), []).append(self.value(o))
+
+        return node
+
+    def embed(self, node: dict, nodes: dict):
+        """Replace the references to nodes of the group by the nodes themselves."""
+
+        for key, values in node.items():
+            if key == "@id":
+                continue
+            for i, v in enumerate(values):
+                if type(v) is dict and len(v) == 1 and v.get("@id") in nodes:
+                    values[i] = self.embed(nodes.pop(v["@id"]), nodes)
+
+            if len(values) == 1:
+                node[key] = values[0]
+
+        return node
+
+    def write(self, node: dict):
+
+        self.outfile.write(("" if self.first else ",\n") + json.dumps(node))
+        self.first = False
+
+    def group(self, root, subjects: list):
+
+        nodes = {self.iri(s): self.node(s, triples) for s, triples in subjects}
+
+        if root is None:
+            # shared nodes, each a frame of its own
+            for node in nodes.values():
+                self.write(self.embed(node, dict()))
+            return
+
+        if self.iri(root) in nodes:
+            self.write(self.embed(nodes.pop(self.iri(root)), nodes))
+
+        while nodes:
+            self.write(self.embed(nodes.pop(next(iter(nodes))), nodes))
+
+    def close(self):
+
+        self.outfile.write("\n]}\n")
+
+
+WRITERS = {
+    ".trig": TriGWriter,
+    ".nq": NQuadsWriter,
+    ".jsonld": JSONLDWriter,
+}
+
+
+def writerFor(target: str):
+    """The writer class for the extension of a target (after .gz or .zst)."""
+
+    extension = "." + stripCompression(target).rsplit(".", 1)[-1]
+
+    if extension not in WRITERS:
+        raise ValueError(
+            f"Unknown format of {target!r}, choose from: {', '.join(WRITERS)}"
+        )
+
+    return WRITERS[extension]
+
+
+def writeTargets(g, targets: list, roots: list = None, level: int = None):
+    """
+    Write a graph to several files in one pass: the triples of every
+    subject are read once and handed to the writer of each target (TriG,
+    N-Quads or JSON-LD, by extension, optionally compressed).
+
+    Subjects are visited per schema:Book, with everything only that Book
+    refers to (see `partition.ownership`), so that the JSON-LD writer can
+    frame each Book as it goes. Entities of several Books come last.
+
+    This is a fan-out after the conversion: the graph is complete (and
+    skolemized) before it is written, the triples are not streamed to the
+    writers while converting.
+
+    Args:
+        g (Graph): The converted graph. Its identifier is the graph name.
+        targets (list): Paths of the files, e.g. ["rdf/ggd.trig", "rdf/ggd.nq.gz"].
+        roots (list): The Books in the order to write them. By default all
+            subjects of type schema:Book.
+        level (int): Compression level of compressed targets.
+
+    Returns:
+        int: The number of triples written to each target.
+    """
+
+    writerClasses = [writerFor(target) for target in targets]
+
+    if roots is None:
+        roots = list(g.subjects(RDF.type, schema.Book))
+    owner = ownership(g, {root: root for root in roots})
+
+    groups = {root: [] for root in roots}
+    groups[None] = []
+    for s in g.subjects(unique=True):
+        groups[owner.get(s)].append(s)
+
+    n = 0
+    with ExitStack() as stack:
+        writers = [
+            writerClass(stack.enter_context(openFile(target, "w", level=level)), g)
+            for writerClass, target in zip(writerClasses, targets)
+        ]
+
+        for root, group in groups.items():
+            subjects = [(s, list(g.triples((s, None, None)))) for s in group]
+            n += sum(len(triples) for _, triples in subjects)
+
+            for writer in writers:
+                writer.group(root, subjects)
+
+        for writer in writers:
+            writer.close()
+
+    return n